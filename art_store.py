@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import functools
+import hashlib
+import os
+import tempfile
+import operations_with_processes as owp
+from flac_core import Parser
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache',
+                                 'flac_parser', 'art')
+BATCH_SIZE = 32
+DEFAULT_EXTENSION = 'bin'
+
+_stores = {}
+
+
+def get_extension(mime_type):
+    extension = mime_type.split('/')[-1].lower()
+    if not extension.isalnum():
+        return DEFAULT_EXTENSION
+
+    return extension
+
+
+def hash_chunks(chunks):
+    digest = hashlib.sha1()
+    for chunk in chunks:
+        digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class HashingWriter:
+    def __init__(self, file):
+        self.file = file
+        self.digest = hashlib.sha1()
+
+    def write(self, data):
+        self.digest.update(data)
+        return self.file.write(data)
+
+    def hexdigest(self):
+        return self.digest.hexdigest()
+
+
+class ArtStore:
+    def __init__(self, directory=DEFAULT_DIRECTORY):
+        self.directory = directory
+        self.known = set()
+        self.created_directories = set()
+
+    def get_name(self, digest, extension):
+        return os.path.join(digest[:2], '{}.{}'.format(digest, extension))
+
+    def get_path(self, digest, extension):
+        return os.path.join(self.directory, self.get_name(digest, extension))
+
+    def contains(self, digest, extension):
+        if (digest, extension) in self.known:
+            return True
+
+        if os.path.exists(self.get_path(digest, extension)):
+            self.known.add((digest, extension))
+            return True
+
+        return False
+
+    def make_temp(self):
+        os.makedirs(self.directory, exist_ok=True)
+        return tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+
+    def commit(self, temp_path, digest, extension):
+        if self.contains(digest, extension):
+            os.remove(temp_path)
+            return
+
+        path = self.get_path(digest, extension)
+        directory = os.path.dirname(path)
+        if directory not in self.created_directories:
+            os.makedirs(directory, exist_ok=True)
+            self.created_directories.add(directory)
+
+        os.replace(temp_path, path)
+        self.known.add((digest, extension))
+
+    def write(self, write_data, extension):
+        descriptor, temp_path = self.make_temp()
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                writer = HashingWriter(file)
+                write_data(writer)
+
+            digest = writer.hexdigest()
+            self.commit(temp_path, digest, extension)
+
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return digest
+
+    def add_from_source(self, source, length, mime_type):
+        return self.write(lambda writer: source.copy_to(length, writer), get_extension(mime_type))
+
+    def add_picture(self, picture):
+        extension = get_extension(picture.mime_type)
+        digest = hash_chunks(picture.iter_chunks())
+        if self.contains(digest, extension):
+            return digest
+
+        def write_data(writer):
+            for chunk in picture.iter_chunks():
+                writer.write(chunk)
+
+        return self.write(write_data, extension)
+
+
+def get_store(directory=DEFAULT_DIRECTORY):
+    if directory not in _stores:
+        _stores[directory] = ArtStore(directory)
+
+    return _stores[directory]
+
+
+def extract_file(path, store):
+    try:
+        with Parser(path, block_types=['PICTURE'], art_store=store) as parser:
+            if not parser.parse_flac():
+                return {'path': path, 'error': 'Given file is not FLAC'}
+
+            pictures = []
+            for picture, digest in zip(parser.pictures, parser.picture_hashes):
+                pictures.append({'hash': digest,
+                                 'file': store.get_name(digest, get_extension(picture.mime_type)),
+                                 'Picture type': picture.picture_type,
+                                 'MIME type': picture.mime_type})
+
+            return {'path': path, 'pictures': pictures}
+
+    except Exception as error:
+        return {'path': path, 'error': '{}: {}'.format(type(error).__name__, error)}
+
+
+def extract_files(paths, directory=DEFAULT_DIRECTORY):
+    store = get_store(directory)
+    return [extract_file(path, store) for path in paths]
+
+
+def extract(paths, directory=DEFAULT_DIRECTORY, workers=None, batch_size=BATCH_SIZE):
+    function = functools.partial(extract_files, directory=directory)
+    for records in owp.map_unordered(function, owp.iter_batches(paths, batch_size), workers):
+        yield from records
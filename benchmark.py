@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import argparse
+import functools
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import flac_generator
+import flac_verifier
+import frame_checker
+import frame_scanner
+import library_scanner
+from flac_core import BLOCK_TYPES, Parser
+from metadata_writer import read_layout
+
+REPEAT = 3
+THRESHOLD = 0.1
+MIN_TIME = 0.05
+
+
+def parse(path, use_mmap=False, block_types=None):
+    with Parser(path, use_mmap=use_mmap, block_types=block_types) as parser:
+        parser.parse_flac()
+
+
+def get_metadata_size(path):
+    with open(path, 'rb') as file:
+        return read_layout(file)[1]
+
+
+def get_block_size(path, block_type):
+    with open(path, 'rb') as file:
+        return sum(slot.size for slot in read_layout(file)[0] if slot.block_type == block_type)
+
+
+def get_entry_points():
+    entry_points = {'parse': (parse, get_metadata_size),
+                    'parse_mmap': (functools.partial(parse, use_mmap=True), get_metadata_size),
+                    'parse_file': (library_scanner.parse_file, get_metadata_size),
+                    'frames': (frame_scanner.build_frame_index, os.path.getsize),
+                    'check': (frame_checker.check_file, os.path.getsize),
+                    'verify': (flac_verifier.verify_file, os.path.getsize)}
+
+    for name in BLOCK_TYPES.keys():
+        entry_points['block:{}'.format(name)] = (
+            functools.partial(parse, block_types=[name]),
+            functools.partial(get_block_size, block_type=BLOCK_TYPES[name]))
+
+    return entry_points
+
+
+def run_once(function, paths, rounds=1):
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    for _ in range(rounds):
+        for path in paths:
+            function(path)
+
+    return (time.perf_counter() - wall) / rounds, (time.process_time() - cpu) / rounds
+
+
+def get_rounds(function, paths):
+    rounds = 1
+    while run_once(function, paths, rounds)[0] * rounds < MIN_TIME:
+        rounds *= 2
+
+    return rounds
+
+
+def measure_peak(function, paths):
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        for path in paths:
+            function(path)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(function, paths, get_size=os.path.getsize, repeat=REPEAT):
+    size = sum(get_size(path) for path in paths)
+    rounds = get_rounds(function, paths)
+    wall, cpu = min(run_once(function, paths, rounds) for _ in range(repeat))
+    wall = wall or 1e-9
+
+    return {'files': len(paths),
+            'bytes': size,
+            'seconds': round(wall, 6),
+            'cpu seconds': round(cpu, 6),
+            'files per second': round(len(paths) / wall, 2),
+            'MB per second': round(size / wall / 1e6, 2),
+            'peak memory': measure_peak(function, paths)}
+
+
+def run(corpus, entry_points=None, repeat=REPEAT):
+    available = get_entry_points()
+    results = {}
+
+    for entry_name in entry_points or available.keys():
+        for shape in corpus.keys():
+            key = '{} / {}'.format(entry_name, shape)
+            function, get_size = available[entry_name]
+            results[key] = measure(function, corpus[shape], get_size, repeat)
+
+    return results
+
+
+def get_environment():
+    return {'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'system': platform.system()}
+
+
+def save_baseline(results, path):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump({'environment': get_environment(), 'results': results}, file,
+                  indent=2, ensure_ascii=False)
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)['results']
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    comparison = {}
+    for key in results.keys():
+        if key not in baseline or not baseline[key]['MB per second']:
+            continue
+
+        ratio = results[key]['MB per second'] / baseline[key]['MB per second']
+        comparison[key] = {'ratio': round(ratio, 3),
+                           'regression': ratio < 1 - threshold}
+
+    return comparison
+
+
+def format_memory(size):
+    return '{:.1f} MB'.format(size / 1e6)
+
+
+def print_results(results, comparison=None):
+    for key in results.keys():
+        result = results[key]
+        line = '{}: {} files/s, {} MB/s, peak {}'.format(
+            key, result['files per second'], result['MB per second'],
+            format_memory(result['peak memory']))
+
+        if comparison and key in comparison:
+            line += ', x{} of baseline{}'.format(
+                comparison[key]['ratio'],
+                ' REGRESSION' if comparison[key]['regression'] else '')
+
+        print(line)
+
+
+def create_parser():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('-d', '--directory', help='corpus directory, generated if missing')
+    arg_parser.add_argument('-c', '--count', type=int, default=5, help='files per shape')
+    arg_parser.add_argument('-r', '--repeat', type=int, default=REPEAT)
+    arg_parser.add_argument('-e', '--entry_points', help='comma separated entry points')
+    arg_parser.add_argument('--shapes', help='comma separated shapes: {}'
+                            .format(','.join(flac_generator.SHAPES)))
+    arg_parser.add_argument('--save', help='path to write the results as a baseline')
+    arg_parser.add_argument('--compare', help='path to a baseline saved earlier')
+    arg_parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                            help='relative slowdown reported as a regression')
+
+    return arg_parser
+
+
+def main(arguments):
+    namespace = create_parser().parse_args(arguments)
+    shapes = namespace.shapes.split(',') if namespace.shapes else None
+    entry_points = namespace.entry_points.split(',') if namespace.entry_points else None
+
+    with tempfile.TemporaryDirectory() as temp_directory:
+        directory = namespace.directory or temp_directory
+        corpus = flac_generator.generate_corpus(directory, shapes, namespace.count)
+        results = run(corpus, entry_points, namespace.repeat)
+
+    comparison = None
+    if namespace.compare:
+        comparison = compare(results, load_baseline(namespace.compare), namespace.threshold)
+
+    print_results(results, comparison)
+    if namespace.save:
+        save_baseline(results, namespace.save)
+
+    if comparison and any(item['regression'] for item in comparison.values()):
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import operations_with_os as owo
+import flac_source as fs
+import flac_stats
+from flac_records import CueSheet, Picture, SeekTable, StreamInfo, VorbisComment
+
+BLOCK_TYPES = {'STREAMINFO': 0,
+               'PADDING': 1,
+               'APPLICATION': 2,
+               'SEEKTABLE': 3,
+               'VORBIS_COMMENT': 4,
+               'CUESHEET': 5,
+               'PICTURE': 6}
+
+BLOCK_NAMES = {value: key for key, value in BLOCK_TYPES.items()}
+
+REPEATABLE_BLOCK_TYPES = {1, 2, 6}
+
+
+def get_block_types(names):
+    block_types = set()
+    for name in names:
+        if isinstance(name, int):
+            block_types.add(name)
+        else:
+            block_types.add(BLOCK_TYPES[name.strip().upper()])
+
+    return block_types
+
+
+class Parser:
+    def __init__(self, source, save_pic=False, use_mmap=False, block_types=None, stats=None,
+                 art_store=None):
+        self.source = fs.open_source(source, use_mmap)
+        self.stats = stats
+        if stats is not None:
+            self.source = flac_stats.InstrumentedSource(self.source, stats)
+        self.bytes = memoryview(b'')
+        self.picture_exist = False
+        self.picture = None
+        self.pictures = []
+        self.picture_hashes = []
+        self.art_store = art_store
+        self.seektable = None
+        self.streaminfo = None
+        self.cuesheet = None
+        self.vorbis_comment = None
+        self.save_pic = save_pic
+        self.block_types = None if block_types is None else get_block_types(block_types)
+        self.result_dict = {}
+        self.pointer = 0
+        self.metadata_ended = False
+        self.audio_offset = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.bytes = memoryview(b'')
+        if self.source.is_mapped:
+            self.detach_payloads()
+
+        self.source.close()
+
+    def detach_payloads(self):
+        for picture in self.pictures:
+            if isinstance(picture.data, memoryview):
+                data = bytes(picture.data)
+                picture.data.release()
+                picture.data = data
+
+        description = self.result_dict.get('Application info', {})
+        for key, value in description.items():
+            if isinstance(value, memoryview):
+                description[key] = bytes(value)
+                value.release()
+
+    def parse_flac(self):
+        if self.stats is not None:
+            return self.parse_flac_with_stats()
+
+        return self.parse_marker_and_metadata()
+
+    def parse_marker_and_metadata(self):
+        if not self.check_marker():
+            return False
+
+        self.parse_metadata_blocks()
+        return True
+
+    def parse_flac_with_stats(self):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        result = self.parse_marker_and_metadata()
+        self.stats.record(flac_stats.FILE, 'parse_flac', self.source.position,
+                          time.perf_counter() - wall, time.process_time() - cpu)
+        return result
+
+    def check_marker(self):
+        try:
+            return self.source.read(4) == b'fLaC'
+        except EOFError:
+            return False
+
+    def parse_metadata_blocks(self):
+        seen_types = set()
+        while not self.metadata_ended:
+            self.pointer = self.source.position
+            current_header = self.source.read(4)
+            self.metadata_ended = bool(current_header[0] >> 7)
+            type_of_block = current_header[0] & 127
+            length_of_block = int.from_bytes(current_header[-3:],
+                                             byteorder='big')
+
+            if not self.is_wanted(type_of_block):
+                self.source.skip(length_of_block)
+                continue
+
+            seen_types.add(type_of_block)
+            if self.stats is None:
+                self.parse_block(type_of_block, length_of_block)
+            else:
+                self.parse_block_with_stats(type_of_block, length_of_block)
+
+            if self.all_wanted_seen(seen_types):
+                break
+
+        self.bytes = memoryview(b'')
+        if self.metadata_ended:
+            self.audio_offset = self.source.start + self.source.position
+
+    def parse_block(self, type_of_block, length_of_block):
+        if type_of_block in (0, 2, 3, 4, 5):
+            self.bytes = memoryview(self.source.read(length_of_block))
+        elif type_of_block != 6:
+            self.source.skip(length_of_block)
+
+        if type_of_block == 0:
+            self.parse_streaminfo_block(length_of_block)
+
+        if type_of_block == 1:
+            self.parse_padding_block(length_of_block)
+
+        if type_of_block == 2:
+            self.parse_application_block(length_of_block)
+
+        if type_of_block == 3:
+            self.parse_seektable_block(length_of_block)
+
+        if type_of_block == 4:
+            self.parse_vorbis_comment(length_of_block)
+
+        if type_of_block == 5:
+            self.parse_cuesheet_block(length_of_block)
+
+        if type_of_block == 6:
+            self.picture_exist = True
+            self.parse_picture_block(length_of_block)
+
+    def parse_block_with_stats(self, type_of_block, length_of_block):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        self.parse_block(type_of_block, length_of_block)
+        self.stats.record(flac_stats.BLOCK, BLOCK_NAMES.get(type_of_block, str(type_of_block)),
+                          length_of_block, time.perf_counter() - wall, time.process_time() - cpu)
+
+    def skip_to_audio(self):
+        while not self.metadata_ended:
+            current_header = self.source.read(4)
+            self.metadata_ended = bool(current_header[0] >> 7)
+            self.source.skip(int.from_bytes(current_header[-3:], byteorder='big'))
+
+        self.audio_offset = self.source.start + self.source.position
+        return self.audio_offset
+
+    def seek(self, sample):
+        if self.seektable is None:
+            return None
+
+        point = self.seektable.seek(sample)
+        if point is None:
+            return None
+
+        if self.audio_offset is None:
+            self.skip_to_audio()
+
+        return point[0], self.audio_offset + point[1]
+
+    def is_wanted(self, type_of_block):
+        return self.block_types is None or type_of_block in self.block_types
+
+    def all_wanted_seen(self, seen_types):
+        if self.block_types is None or self.block_types & REPEATABLE_BLOCK_TYPES:
+            return False
+
+        return self.block_types <= seen_types
+
+    def parse_application_block(self, length_of_block):
+        self.application_description = {'Application ID': 4,
+                                        'Data': length_of_block - 4}
+
+        local_pointer = 0
+
+        for key in self.application_description.keys():
+            section_length = self.application_description[key]
+            value = self.bytes[local_pointer:local_pointer + section_length]
+            self.application_description[key] = value
+            local_pointer += section_length
+
+        self.result_dict['Application info'] = self.application_description
+
+    def parse_cuesheet_block(self, length_of_block):
+        self.cuesheet = CueSheet.from_bytes(self.bytes)
+        self.result_dict['Cuesheet info'] = self.cuesheet
+
+    def parse_picture_block(self, length_of_block):
+        self.picture_description = {'Picture type': 4,
+                                    'MIME type': 4,
+                                    'Description': 4,
+                                    'Width': 4,
+                                    'Height': 4,
+                                    'Color depth': 4,
+                                    'Number of used colors': 4,
+                                    'Picture bytes': 4}
+
+        for key in self.picture_description.keys():
+            section_length = self.picture_description[key]
+            value = int.from_bytes(self.source.read(section_length), byteorder='big')
+            if key in ['MIME type', 'Description']:
+                value = str(self.source.read(value), 'utf-8')
+
+            self.picture_description[key] = value
+
+        length = self.picture_description['Picture bytes']
+        offset = self.source.start + self.source.position
+
+        if self.art_store is not None and not self.source.seekable:
+            self.picture_hashes.append(self.art_store.add_from_source(
+                self.source, length, self.picture_description['MIME type']))
+            data = None
+        elif self.save_pic and not self.source.seekable:
+            self.get_pic_name()
+            with open(self.pic_name, 'wb') as file:
+                self.source.copy_to(length, file)
+            data = None
+        else:
+            data = self.source.take(length)
+
+        file = self.source.file if self.source.path is None and self.source.seekable else None
+        picture = Picture(self.picture_description['Picture type'],
+                          self.picture_description['MIME type'],
+                          self.picture_description['Description'],
+                          self.picture_description['Width'],
+                          self.picture_description['Height'],
+                          self.picture_description['Color depth'],
+                          self.picture_description['Number of used colors'],
+                          offset, length, self.source.path, file, data)
+        self.pictures.append(picture)
+        if self.picture is None:
+            self.picture = picture
+            self.result_dict['Picture info'] = picture.to_dict()
+
+        if self.art_store is not None and self.source.seekable:
+            self.picture_hashes.append(self.art_store.add_picture(picture))
+
+        if self.save_pic and self.source.seekable:
+            self.get_pic_name()
+            picture.save_to(self.pic_name)
+
+    def parse_seektable_block(self, length_of_block):
+        self.seektable = SeekTable.from_bytes(self.bytes)
+        self.result_dict['Seektable'] = self.seektable
+
+    def parse_vorbis_comment(self, length_of_block):
+        self.vorbis_comment = VorbisComment.from_bytes(self.bytes)
+        self.vendor = self.vorbis_comment.vendor
+        self.result_dict['Vorbis comments'] = self.vorbis_comment
+
+    def parse_streaminfo_block(self, length_of_block):
+        self.streaminfo = StreamInfo.from_bytes(self.bytes)
+        self.result_dict['Stream info'] = self.streaminfo
+
+    def parse_padding_block(self, length_of_block):
+        pass
+
+    def get_pic_name(self):
+        self.extension = self.picture_description['MIME type'].split('/')[1]
+        self.pic_name = owo.get_free_name('picture.{}'.format(self.extension))
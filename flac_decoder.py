@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import operator
+import numpy as np
+import frame_scanner
+from operations_with_bytes_and_bits import BitReader
+
+SUBFRAME_CONSTANT = 0
+SUBFRAME_VERBATIM = 1
+
+
+class DecodingError(ValueError):
+    pass
+
+
+def gather_bits(bits, starts, width):
+    if width == 0:
+        return np.zeros(len(starts), dtype=np.int64)
+
+    positions = starts[:, None] + np.arange(width, dtype=np.int64)
+    weights = np.left_shift(1, np.arange(width - 1, -1, -1, dtype=np.int64))
+    return bits[positions].astype(np.int64) @ weights
+
+
+def to_signed(values, width):
+    if width == 0:
+        return values
+
+    return np.where(values >> (width - 1), values - (1 << width), values)
+
+
+class FrameDecoder:
+    def __init__(self, header, data):
+        self.header = header
+        self.data = data
+        self.reader = BitReader(data, header.header_length * 8)
+        self.bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+        self.ones = None
+        self.next_one = None
+
+    def decode(self):
+        header = self.header
+        decorrelation = header.get_decorrelation()
+        channels = []
+
+        for channel in range(header.channels):
+            bits_per_sample = header.bits_per_sample
+            if ((decorrelation == frame_scanner.LEFT_SIDE and channel == 1)
+                    or (decorrelation == frame_scanner.RIGHT_SIDE and channel == 0)
+                    or (decorrelation == frame_scanner.MID_SIDE and channel == 1)):
+                bits_per_sample += 1
+
+            channels.append(self.decode_subframe(bits_per_sample))
+
+        self.reader.align()
+        self.reader.skip_bits(16)
+
+        return decorrelate(channels, decorrelation)
+
+    def decode_subframe(self, bits_per_sample):
+        reader = self.reader
+        if reader.read_bits(1):
+            raise DecodingError('Invalid subframe padding bit')
+
+        subframe_type = reader.read_bits(6)
+        wasted_bits = 0
+        if reader.read_bits(1):
+            wasted_bits = reader.read_unary() + 1
+            bits_per_sample -= wasted_bits
+
+        if subframe_type == SUBFRAME_CONSTANT:
+            value = reader.read_signed(bits_per_sample)
+            samples = np.full(self.header.block_size, value, dtype=np.int64)
+
+        elif subframe_type == SUBFRAME_VERBATIM:
+            samples = self.read_signed_run(self.header.block_size, bits_per_sample)
+
+        elif 8 <= subframe_type <= 12:
+            samples = self.decode_fixed(subframe_type & 7, bits_per_sample)
+
+        elif subframe_type >= 32:
+            samples = self.decode_lpc((subframe_type & 31) + 1, bits_per_sample)
+
+        else:
+            raise DecodingError('Reserved subframe type {}'.format(subframe_type))
+
+        if wasted_bits:
+            samples <<= wasted_bits
+
+        return samples
+
+    def read_signed_run(self, count, width):
+        starts = self.reader.position + np.arange(count, dtype=np.int64) * width
+        values = to_signed(gather_bits(self.bits, starts, width), width)
+        self.reader.skip_bits(count * width)
+        return values
+
+    def decode_fixed(self, order, bits_per_sample):
+        warmup = self.read_signed_run(order, bits_per_sample)
+        residual = self.read_residual(order)
+
+        samples = residual
+        for level in range(order - 1, -1, -1):
+            start = np.diff(warmup, n=level)[-1]
+            samples = start + np.cumsum(samples)
+
+        return np.concatenate((warmup, samples))
+
+    def decode_lpc(self, order, bits_per_sample):
+        reader = self.reader
+        warmup = self.read_signed_run(order, bits_per_sample)
+        precision = reader.read_bits(4) + 1
+        if precision == 16:
+            raise DecodingError('Invalid LPC coefficient precision')
+
+        shift = reader.read_signed(5)
+        if shift < 0:
+            raise DecodingError('Negative LPC shift')
+
+        coefficients = [reader.read_signed(precision) for _ in range(order)]
+        coefficients.reverse()
+        residual = self.read_residual(order).tolist()
+
+        history = warmup.tolist()
+        samples = warmup.tolist()
+        append = samples.append
+        multiply = operator.mul
+        for value in residual:
+            value += sum(map(multiply, coefficients, history)) >> shift
+            append(value)
+            del history[0]
+            history.append(value)
+
+        return np.array(samples, dtype=np.int64)
+
+    def read_residual(self, predictor_order):
+        reader = self.reader
+        coding_method = reader.read_bits(2)
+        if coding_method > 1:
+            raise DecodingError('Reserved residual coding method')
+
+        parameter_bits = 4 if coding_method == 0 else 5
+        escape_code = (1 << parameter_bits) - 1
+        partition_order = reader.read_bits(4)
+        partitions_count = 1 << partition_order
+        partition_size = self.header.block_size >> partition_order
+
+        parts = []
+        for partition in range(partitions_count):
+            count = partition_size - predictor_order if partition == 0 else partition_size
+            if count < 0:
+                raise DecodingError('Invalid residual partition size')
+
+            parameter = reader.read_bits(parameter_bits)
+            if parameter == escape_code:
+                width = reader.read_bits(5)
+                parts.append(self.read_signed_run(count, width))
+            else:
+                parts.append(self.read_rice(count, parameter))
+
+        if len(parts) == 1:
+            return parts[0]
+
+        return np.concatenate(parts)
+
+    def read_rice(self, count, parameter):
+        if not count:
+            return np.zeros(0, dtype=np.int64)
+
+        if self.ones is None:
+            self.ones = np.flatnonzero(self.bits)
+            self.next_one = np.zeros(len(self.bits) + 1, dtype=np.int64)
+            np.cumsum(self.bits, out=self.next_one[1:])
+
+        bits_count = len(self.bits)
+        step = parameter + 1
+        first = self.reader.position
+        if first > bits_count:
+            raise DecodingError('Residual runs past the end of the frame')
+
+        start = self.next_one[first]
+        window = self.ones[start:start + count * step]
+        size = len(window)
+
+        jumps = np.empty(size + 1, dtype=np.int64)
+        jumps[:size] = self.next_one[np.minimum(window + step, bits_count)] - start
+        jumps[size] = size
+        np.minimum(jumps, size, out=jumps)
+
+        indexes = np.empty(count, dtype=np.int64)
+        indexes[0] = 0
+        done = 1
+        while done < count:
+            chunk = min(done, count - done)
+            indexes[done:done + chunk] = jumps[indexes[:chunk]]
+            done += chunk
+            if done < count:
+                jumps = jumps[jumps]
+
+        if indexes[-1] >= size or window[indexes[-1]] + step > bits_count:
+            raise DecodingError('Residual runs past the end of the frame')
+
+        stops = window[indexes]
+        self.reader.position = int(stops[-1]) + step
+
+        starts = np.empty_like(stops)
+        starts[0] = first
+        starts[1:] = stops[:-1] + step
+        quotients = stops - starts
+
+        values = quotients << parameter
+        if parameter:
+            values |= gather_bits(self.bits, stops + 1, parameter)
+
+        return (values >> 1) ^ -(values & 1)
+
+
+def decorrelate(channels, decorrelation):
+    if decorrelation == frame_scanner.LEFT_SIDE:
+        left, side = channels
+        channels = [left, left - side]
+
+    elif decorrelation == frame_scanner.RIGHT_SIDE:
+        side, right = channels
+        channels = [side + right, right]
+
+    elif decorrelation == frame_scanner.MID_SIDE:
+        mid, side = channels
+        mid = (mid << 1) | (side & 1)
+        channels = [(mid + side) >> 1, (mid - side) >> 1]
+
+    return np.stack(channels, axis=1).astype(np.int32)
+
+
+def decode_frame(header, data):
+    return FrameDecoder(header, data).decode()
+
+
+class Decoder:
+    def __init__(self, path, chunk_size=frame_scanner.CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.stream, self.audio_offset = frame_scanner.read_stream(path)
+
+    def iter_frames(self, start_offset=None):
+        with open(self.path, 'rb') as file:
+            scanner = frame_scanner.FrameScanner(file, start_offset or self.audio_offset,
+                                                 self.stream, self.chunk_size, True)
+            for header, data in scanner:
+                yield header, decode_frame(header, data)
+
+    def __iter__(self):
+        for header, samples in self.iter_frames():
+            yield samples
+
+
+def iter_decoded(path):
+    return iter(Decoder(path))
@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import argparse
+import hashlib
+import os
+import random
+import struct
+import sys
+import numpy as np
+from flac_core import BLOCK_TYPES
+from flac_records import SEEKPOINT, StreamInfo
+from metadata_writer import make_picture, make_vorbis_comment
+from operations_with_bytes_and_bits import crc8, crc16, write_utf8_number
+
+STREAMINFO = BLOCK_TYPES['STREAMINFO']
+PADDING = BLOCK_TYPES['PADDING']
+APPLICATION = BLOCK_TYPES['APPLICATION']
+SEEKTABLE = BLOCK_TYPES['SEEKTABLE']
+VORBIS_COMMENT = BLOCK_TYPES['VORBIS_COMMENT']
+CUESHEET = BLOCK_TYPES['CUESHEET']
+PICTURE = BLOCK_TYPES['PICTURE']
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+BITS_PER_SAMPLE = 16
+BLOCK_SIZE = 4096
+
+BLOCK_SIZE_CODE = 12
+SAMPLE_RATE_CODE = 9
+SAMPLE_SIZE_CODE = 4
+VARIABLE_BLOCK_SIZE_CODE = 7
+
+SUBFRAME_CONSTANT = 0x00
+SUBFRAME_VERBATIM = 0x01
+SUBFRAME_FIXED = 0x08
+MAX_FIXED_ORDER = 4
+MAX_RICE_PARAMETER = 30
+
+LEFT_SIDE = 8
+RIGHT_SIDE = 9
+MID_SIDE = 10
+CHANNEL_ASSIGNMENTS = (CHANNELS - 1, LEFT_SIDE, RIGHT_SIDE, MID_SIDE)
+
+SHAPES = {'minimal': {},
+          'tags': {'tags_count': 5000},
+          'picture': {'picture_bytes': 4 * 1024 * 1024},
+          'cuesheet': {'cue_tracks': 99, 'cue_indexes': 20},
+          'seektable': {'seekpoints': 20000},
+          'application': {'application_bytes': 4 * 1024 * 1024},
+          'audio': {'frames': 500, 'noise': True},
+          'fixed': {'frames': 500, 'encoding': 'fixed'},
+          'mixed': {'tags_count': 200, 'picture_bytes': 512 * 1024,
+                    'cue_tracks': 20, 'cue_indexes': 3, 'seekpoints': 100,
+                    'application_bytes': 64 * 1024, 'frames': 50, 'encoding': 'fixed'}}
+
+
+def make_block(block_type, body, is_last=False):
+    return bytes([(0x80 if is_last else 0) | block_type]) + \
+        len(body).to_bytes(3, byteorder='big') + body
+
+
+def make_png_stub(size, generator):
+    header = b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + \
+        struct.pack('>IIBBBBB', 1000, 1000, 8, 2, 0, 0, 0)
+    return header + generator.randbytes(max(size - len(header), 0))
+
+
+def make_tags(count, generator):
+    tags = [('TITLE', 'Synthetic track'), ('ARTIST', 'Generator')]
+    for number in range(count):
+        tags.append(('TAG{}'.format(number % 97),
+                     'value {} {:08x}'.format(number, generator.getrandbits(32))))
+
+    return tags
+
+
+def make_cuesheet(tracks_count, indexes_count, total_samples):
+    parts = [b'0000000000000'.ljust(128, b'\x00'), struct.pack('>Q', 88200),
+             b'\x80', bytes(258), bytes([tracks_count + 1])]
+    step = total_samples // max(tracks_count, 1) // 588 * 588
+
+    for number in range(1, tracks_count + 1):
+        parts.append(struct.pack('>QB', (number - 1) * step, number))
+        parts.append('SYN{:09d}'.format(number).encode('ascii'))
+        parts.append(b'\x00' + bytes(13) + bytes([indexes_count]))
+        for index in range(indexes_count):
+            parts.append(struct.pack('>QB', index * 588, index + 1) + bytes(3))
+
+    parts.append(struct.pack('>QB', total_samples, 170) + bytes(12) + b'\x00' + bytes(13) + b'\x00')
+    return b''.join(parts)
+
+
+def make_seektable(count, total_samples):
+    step = max(total_samples // max(count, 1), 1)
+    return b''.join(SEEKPOINT.pack(number * step, number * 1024, BLOCK_SIZE)
+                    for number in range(count))
+
+
+def get_bits(values, width):
+    values = np.asarray(values, dtype=np.int64).reshape(-1)
+    shifts = np.arange(width - 1, -1, -1, dtype=np.int64)
+    return ((values[:, None] >> shifts) & 1).astype(np.uint8).ravel()
+
+
+def make_subframe_header(subframe_type, wasted_bits=0):
+    bits = get_bits((subframe_type << 1) | bool(wasted_bits), 8)
+    if not wasted_bits:
+        return bits
+
+    unary = np.zeros(wasted_bits, dtype=np.uint8)
+    unary[-1] = 1
+    return np.concatenate((bits, unary))
+
+
+def make_constant_subframe(value, bits_per_sample):
+    return np.concatenate((make_subframe_header(SUBFRAME_CONSTANT),
+                           get_bits(value, bits_per_sample)))
+
+
+def make_verbatim_subframe(samples, bits_per_sample):
+    return np.concatenate((make_subframe_header(SUBFRAME_VERBATIM),
+                           get_bits(samples, bits_per_sample)))
+
+
+def get_rice_parameter(values):
+    if not len(values):
+        return 0
+
+    mean = int(((values << 1) ^ (values >> 63)).mean())
+    return min(max(mean.bit_length() - 1, 0), MAX_RICE_PARAMETER)
+
+
+def get_rice_bits(values, parameter):
+    folded = (values << 1) ^ (values >> 63)
+    quotients = folded >> parameter
+    lengths = quotients + 1 + parameter
+    starts = np.cumsum(lengths) - lengths
+
+    bits = np.zeros(int(lengths.sum()), dtype=np.uint8)
+    bits[starts + quotients] = 1
+    if parameter:
+        positions = (starts + quotients + 1)[:, None] + np.arange(parameter, dtype=np.int64)
+        bits[positions.ravel()] = get_bits(folded, parameter)
+
+    return bits
+
+
+def get_escape_width(values):
+    if not len(values):
+        return 0
+
+    return int(max(values.max(), -values.min() - 1)).bit_length() + 1
+
+
+def make_residual(residual, predictor_order, block_size, partition_order=0, escape=False):
+    partition_size = block_size >> partition_order
+    bounds = [0] + [partition_size * number - predictor_order
+                    for number in range(1, (1 << partition_order) + 1)]
+    partitions = [residual[start:end] for start, end in zip(bounds, bounds[1:])]
+    parameters = [get_rice_parameter(partition) for partition in partitions]
+    parameter_bits = 5 if max(parameters) > 14 else 4
+
+    parts = [get_bits(((parameter_bits - 4) << 4) | partition_order, 6)]
+    for partition, parameter in zip(partitions, parameters):
+        if escape:
+            width = get_escape_width(partition)
+            parts.append(get_bits((1 << parameter_bits) - 1, parameter_bits))
+            parts.append(get_bits(width, 5))
+            if width:
+                parts.append(get_bits(partition, width))
+        else:
+            parts.append(get_bits(parameter, parameter_bits))
+            parts.append(get_rice_bits(partition, parameter))
+
+    return np.concatenate(parts)
+
+
+def make_fixed_subframe(samples, order, bits_per_sample, partition_order=0,
+                        wasted_bits=0, escape=False):
+    samples = np.asarray(samples, dtype=np.int64) >> wasted_bits
+    bits_per_sample -= wasted_bits
+    residual = np.diff(samples, n=order)
+    return np.concatenate((make_subframe_header(SUBFRAME_FIXED | order, wasted_bits),
+                           get_bits(samples[:order], bits_per_sample),
+                           make_residual(residual, order, len(samples), partition_order, escape)))
+
+
+def get_stereo_channels(left, right, channel_assignment):
+    if channel_assignment == LEFT_SIDE:
+        return [(left, BITS_PER_SAMPLE), (left - right, BITS_PER_SAMPLE + 1)]
+
+    if channel_assignment == RIGHT_SIDE:
+        return [(left - right, BITS_PER_SAMPLE + 1), (right, BITS_PER_SAMPLE)]
+
+    if channel_assignment == MID_SIDE:
+        return [((left + right) >> 1, BITS_PER_SAMPLE), (left - right, BITS_PER_SAMPLE + 1)]
+
+    return [(left, BITS_PER_SAMPLE), (right, BITS_PER_SAMPLE)]
+
+
+def make_frame(number, samples_count, subframes, channel_assignment=CHANNELS - 1):
+    header = bytearray(b'\xff\xf8')
+    if samples_count == BLOCK_SIZE:
+        header.append((BLOCK_SIZE_CODE << 4) | SAMPLE_RATE_CODE)
+    else:
+        header.append((VARIABLE_BLOCK_SIZE_CODE << 4) | SAMPLE_RATE_CODE)
+
+    header.append((channel_assignment << 4) | (SAMPLE_SIZE_CODE << 1))
+    header += write_utf8_number(number)
+    if samples_count != BLOCK_SIZE:
+        header += (samples_count - 1).to_bytes(2, byteorder='big')
+    header.append(crc8(header))
+
+    header += np.packbits(np.concatenate(subframes)).tobytes()
+    header += crc16(header).to_bytes(2, byteorder='big')
+    return bytes(header)
+
+
+def make_signal(samples_count, generator):
+    period = generator.randrange(20, 400)
+    phase = generator.random() * 2 * np.pi
+    amplitude = generator.randrange(1000, 20000)
+    noise = np.random.default_rng(generator.getrandbits(32)).integers(-64, 65, samples_count)
+    wave = amplitude * np.sin(phase + 2 * np.pi * np.arange(samples_count) / period)
+    return np.clip(np.rint(wave).astype(np.int64) + noise, -32768, 32767)
+
+
+def make_audio(frames_count, noise, generator, encoding=None):
+    frames = []
+    md5 = hashlib.md5()
+    total_samples = frames_count * BLOCK_SIZE - (BLOCK_SIZE // 3 if frames_count else 0)
+    encoding = encoding or ('verbatim' if noise else 'constant')
+
+    for number in range(frames_count):
+        samples_count = min(BLOCK_SIZE, total_samples - number * BLOCK_SIZE)
+        channel_assignment = CHANNELS - 1
+        if encoding == 'verbatim':
+            channels = [np.frombuffer(generator.randbytes(samples_count * 2), dtype='>i2')
+                        .astype(np.int64) for _ in range(CHANNELS)]
+            subframes = [make_verbatim_subframe(channel, BITS_PER_SAMPLE) for channel in channels]
+
+        elif encoding == 'fixed':
+            channels = [make_signal(samples_count, generator) for _ in range(CHANNELS)]
+            channel_assignment = CHANNEL_ASSIGNMENTS[number % len(CHANNEL_ASSIGNMENTS)]
+            order = 1 + number % MAX_FIXED_ORDER
+            partition_order = number % 3 if samples_count == BLOCK_SIZE else 0
+            subframes = [make_fixed_subframe(channel, order, bits_per_sample, partition_order)
+                         for channel, bits_per_sample
+                         in get_stereo_channels(*channels, channel_assignment)]
+
+        else:
+            values = [generator.randrange(-32768, 32768) for _ in range(CHANNELS)]
+            channels = [np.full(samples_count, value, dtype=np.int64) for value in values]
+            subframes = [make_constant_subframe(value, BITS_PER_SAMPLE) for value in values]
+
+        frames.append(make_frame(number, samples_count, subframes, channel_assignment))
+        md5.update(np.stack(channels, axis=1).astype('<i2').tobytes())
+
+    return frames, total_samples, md5.digest()
+
+
+def make_flac(tags_count=10, picture_bytes=0, cue_tracks=0, cue_indexes=1,
+              seekpoints=0, application_bytes=0, padding=8192, frames=4,
+              noise=False, encoding=None, seed=0):
+    generator = random.Random(seed)
+    audio, total_samples, md5 = make_audio(frames, noise, generator, encoding)
+    frame_sizes = [len(frame) for frame in audio] or [0]
+
+    streaminfo = StreamInfo(BLOCK_SIZE, BLOCK_SIZE, min(frame_sizes), max(frame_sizes),
+                            SAMPLE_RATE, CHANNELS, BITS_PER_SAMPLE, total_samples,
+                            int.from_bytes(md5, byteorder='big'))
+    blocks = [(STREAMINFO, streaminfo.to_bytes())]
+    if seekpoints:
+        blocks.append((SEEKTABLE, make_seektable(seekpoints, total_samples)))
+
+    blocks.append((VORBIS_COMMENT, make_vorbis_comment('flac_generator',
+                                                       make_tags(tags_count, generator))))
+    if cue_tracks:
+        blocks.append((CUESHEET, make_cuesheet(cue_tracks, cue_indexes, total_samples)))
+
+    if application_bytes:
+        blocks.append((APPLICATION, b'SYNT' + generator.randbytes(application_bytes)))
+
+    if picture_bytes:
+        blocks.append((PICTURE, make_picture(make_png_stub(picture_bytes, generator),
+                                             description='Synthetic cover')))
+
+    if padding:
+        blocks.append((PADDING, bytes(padding)))
+
+    parts = [b'fLaC']
+    for number, (block_type, body) in enumerate(blocks):
+        parts.append(make_block(block_type, body, number == len(blocks) - 1))
+
+    parts.extend(audio)
+    return b''.join(parts)
+
+
+def write_flac(path, **shape):
+    with open(path, 'wb') as file:
+        file.write(make_flac(**shape))
+
+
+def generate_corpus(directory, shapes=None, count=1, seed=0, overwrite=False):
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+
+    for name in shapes or SHAPES.keys():
+        paths[name] = []
+        for number in range(count):
+            path = os.path.join(directory, '{}_{:04d}.flac'.format(name, number))
+            if overwrite or not os.path.exists(path):
+                write_flac(path, seed=seed + number, **SHAPES[name])
+            paths[name].append(path)
+
+    return paths
+
+
+def create_parser():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('-d', '--directory', required=True)
+    arg_parser.add_argument('-c', '--count', type=int, default=1)
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--shapes', help='comma separated shapes: {}'.format(','.join(SHAPES)))
+
+    return arg_parser
+
+
+if __name__ == '__main__':
+    namespace = create_parser().parse_args(sys.argv[1:])
+    shapes = namespace.shapes.split(',') if namespace.shapes else None
+    corpus = generate_corpus(namespace.directory, shapes, namespace.count, namespace.seed)
+    for name in corpus.keys():
+        print('{}: {} files'.format(name, len(corpus[name])))
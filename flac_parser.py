@@ -2,306 +2,222 @@
 # -*- coding: utf-8 -*-
 
 import argparse
-import operations_with_os as owo
-import copy
 import sys
+import operations_with_os as owo
+import flac_stats
+from flac_core import BLOCK_NAMES, BLOCK_TYPES, REPEATABLE_BLOCK_TYPES, Parser, get_block_types
+from flac_records import make_serializable
 
 
-class Parser:
-    def __init__(self, flac_bytes, save_pic):
-        self.bytes = flac_bytes
-        self.picture_exist = False
-        self.save_pic = save_pic
-        self.result_dict = {}
-        self.pointer = 0
-
-    def parse_flac(self):
-        self.parse_metadata_blocks()
-
-    def parse_metadata_blocks(self):
-        is_ended = 0
-        while not is_ended:
-            current_header = self.bytes[self.pointer:self.pointer + 4]
-            is_ended = current_header[0] >> 7
-            type_of_block = current_header[0] & 127
-            length_of_block = int.from_bytes(current_header[-3:],
-                                             byteorder='big')
-
-            if type_of_block == 0:
-                self.parse_streaminfo_block(length_of_block)
-
-            if type_of_block == 1:
-                self.parse_padding_block(length_of_block)
-
-            if type_of_block == 2:
-                self.parse_application_block(length_of_block)
-
-            if type_of_block == 3:
-                self.parse_seektable_block(length_of_block)
-
-            if type_of_block == 4:
-                self.parse_vorbis_comment(length_of_block)
-
-            if type_of_block == 5:
-                self.parse_cuesheet_block(length_of_block)
-
-            if type_of_block == 6:
-                self.picture_exist = True
-                self.parse_picture_block(length_of_block)
-
-            self.pointer += (length_of_block + 4)
-
-    def parse_application_block(self, length_of_block):
-        self.application_description = {'Application ID': 4,
-                                        'Data': length_of_block - 4}
+def parse_blocks_argument(value):
+    try:
+        return get_block_types(value.split(','))
+    except KeyError as error:
+        raise argparse.ArgumentTypeError('unknown block type {}'.format(error))
 
-        local_pointer = self.pointer + 4
 
-        for key in self.picture_description.keys():
-            section_length = self.picture_description[key]
-            value = self.bytes[local_pointer:local_pointer + section_length]
-            self.application_description[key] = value
-            local_pointer += section_length
+def parse_query_argument(value):
+    from library_index import parse_condition
 
-        self.result_dict['Application info'] = self.application_description
+    try:
+        return parse_condition(value)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error))
 
-    def parse_cuesheet_block(self, length_of_block):
-        self.cuesheet_description = {'Media catalog number': 128,
-                                     'Number of lead-in samples': 8,
-                                     'Is a compact disk': 1,
-                                     '~reserved~': 258,
-                                     'Tracks count': 1,
-                                     'Tracks': []}
 
-        local_pointer = self.pointer + 4
+def create_parser():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('-m', '--method')
+    arg_parser.add_argument('-f', '--flac')
+    arg_parser.add_argument('-d', '--directory')
+    arg_parser.add_argument('-o', '--output')
+    arg_parser.add_argument('-w', '--workers', type=int)
+    arg_parser.add_argument('--cache', help='path to the SQLite metadata cache')
+    arg_parser.add_argument('-s', '--sample', type=int, help='sample number to seek to')
+    arg_parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE')
+    arg_parser.add_argument('--add', action='append', default=[], metavar='KEY=VALUE')
+    arg_parser.add_argument('--remove_tag', action='append', default=[], metavar='KEY')
+    arg_parser.add_argument('--index', help='path to a saved library index')
+    arg_parser.add_argument('--records', help='JSON lines written by the scan method')
+    arg_parser.add_argument('-q', '--query', action='append', default=[], type=parse_query_argument,
+                            metavar='CONDITION', help='e.g. ARTIST=X or sample_rate>48000')
+    arg_parser.add_argument('--limit', type=int)
+    arg_parser.add_argument('--picture', help='image file to embed as the front cover')
+    arg_parser.add_argument('--remove_pictures', default=False, action='store_true')
+    arg_parser.add_argument('-sp', '--save_pic', default=False, action='store_true')
+    arg_parser.add_argument('--art_dir', help='content-addressed directory for extracted pictures')
+    arg_parser.add_argument('--format', default='wav', choices=['wav', 'raw'],
+                            help='output format of the export method')
+    arg_parser.add_argument('--mmap', default=False, action='store_true')
+    arg_parser.add_argument('--stats', default=False, action='store_true',
+                            help='print per-block and I/O timings to stderr')
+    arg_parser.add_argument('-b', '--blocks', type=parse_blocks_argument,
+                            help='comma separated block types to parse, e.g. STREAMINFO,VORBIS_COMMENT')
 
-        for key in self.cuesheet_description.keys():
-            if key == 'Tracks':
-                local_pointer = self.parse_cuesheet_tracks(self.cuesheet_description['Tracks count'], local_pointer)
-                self.cuesheet_description[key] = copy.deepcopy(self.tracks)
-                break
+    return arg_parser
 
-            section_length = self.cuesheet_description[key]
-            value = self.bytes[local_pointer:local_pointer + section_length]
-            local_pointer += section_length
 
-            if key == 'Media catalog number':
-                value = value.decode('ascii')
+if __name__ == '__main__':
+    parser = create_parser()
+    namespace = parser.parse_args(sys.argv[1:])
+    stats = flac_stats.ParseStats() if namespace.stats else None
 
-            elif key == 'Is a compact disk':
-                value = int.from_bytes(value, byteorder='big') >> 7
+    if namespace.method == 'parse_flac':
+        source = sys.stdin.buffer if namespace.flac == '-' else namespace.flac
+        with Parser(source, namespace.save_pic, namespace.mmap, namespace.blocks,
+                    stats) as parser:
+            if parser.parse_flac():
+                result = make_serializable(parser.result_dict)
+                for key in result.keys():
+                    print('{}: {}'.format(key, result[key]))
 
             else:
-                value = int.from_bytes(value, byteorder='big')
-
-            self.cuesheet_description[key] = value
-
-        self.result_dict['Cuesheet info'] = self.cuesheet_description
-        print(self.cuesheet_description)
-
-    def parse_cuesheet_tracks(self, tracks_count, pointer):
-        self.tracks = {}
-
-        track_description = {'Offset': 8,
-                             'Track number': 1,
-                             'ISRC': 12,
-                             'Type': 1,
-                             'Pre-emphasis': 1,
-                             '~reserved~': 13,
-                             'Index points count': 1,
-                             'Index points': []}
-
-        local_pointer = pointer
-
-        for i in range(tracks_count):
-            track = copy.deepcopy(track_description)
-
-            for key in track.keys():
-                if key == 'Index points':
-                    local_pointer = self.parse_indexes(track['Index points count'], local_pointer)
-                    track[key] = copy.deepcopy(self.indexes)
-                    break
-
-                section_length = track[key]
-                value = self.bytes[local_pointer:local_pointer + section_length]
-                local_pointer += section_length
-
-                if key == 'ISRC':
-                    value = value.decode('ascii')
-
-                elif key == 'Type':
-                    value = int.from_bytes(value, byteorder='big') >> 7
-                    local_pointer -= 1
-
-                elif key == 'Pre-emphasic':
-                    value = (int.from_bytes(value, byteorder='big') >> 6) & 1
-
-                else:
-                    value = int.from_bytes(value, byteorder='big')
-
-                track[key] = value
-
-            self.tracks['track{}'.format(i)] = track
-
-        return local_pointer
-
-    def parse_indexes(self, index_points_count, pointer):
-        self.indexes = {}
-
-        index_description = {'Offset': 8,
-                             'Index point number': 1,
-                             '~reserved~': 3}
-
-        local_pointer = pointer
-
-        for i in range(index_points_count):
-            index = copy.deepcopy(index_description)
-
-            for key in index.keys():
-                section_length = index[key]
-                value = self.bytes[local_pointer:local_pointer + section_length]
-                local_pointer += section_length
-
-                value = int.from_bytes(value, byteorder='big')
-
-                index[key] = value
-
-            self.indexes['index{}'.format(i)] = index
-
-        return local_pointer
-
-    def parse_picture_block(self, length_of_block):
-        self.picture_description = {'Picture type': 4,
-                                    'MIME type': 4,
-                                    'Description': 4,
-                                    'Width': 4,
-                                    'Height': 4,
-                                    'Color depth': 4,
-                                    'Number of used colors': 4,
-                                    'Picture bytes': 4}
-
-        local_pointer = self.pointer + 4
+                print('Given file is not FLAC')
+
+    if namespace.method == 'scan':
+        import library_scanner
+        from metadata_cache import MetadataCache
+
+        cache = MetadataCache(namespace.cache) if namespace.cache else None
+        records = library_scanner.scan(namespace.directory, namespace.workers,
+                                       namespace.blocks, cache, stats=stats)
+        try:
+            library_scanner.write_output(records, namespace.output)
+        finally:
+            if cache is not None:
+                cache.close()
+
+    if namespace.method == 'serve':
+        import library_scanner
+
+        library_scanner.serve(block_types=namespace.blocks, stats=stats)
+
+    if namespace.method == 'frames':
+        import frame_scanner
+
+        index = frame_scanner.build_frame_index(namespace.flac)
+        result = index.to_dict()
+        for key in result.keys():
+            print('{}: {}'.format(key, result[key]))
+
+        if namespace.sample is not None:
+            position = index.seek(namespace.sample)
+            if position is None:
+                print('Seek to {}: no audio frames found'.format(namespace.sample))
+            else:
+                print('Seek to {}: frame at sample {}, byte offset {}'
+                      .format(namespace.sample, *position))
 
-        for key in self.picture_description.keys():
-            section_length = self.picture_description[key]
-            value = self.bytes[local_pointer:local_pointer + section_length]
-            value = int.from_bytes(value, byteorder='big')
-            local_pointer += section_length
-            if key in ['MIME type', 'Description', 'Picture bytes']:
-                length = value
-                value = bytearray(self.bytes[local_pointer:local_pointer + value])
-                local_pointer += length
+    if namespace.method == 'verify':
+        import flac_verifier
+        import library_scanner
 
-                if key in ['MIME type', 'Description']:
-                    value = value.decode('utf-8')
-                
-                else:
-                    self.get_pic_name()
-                    self.pic_bytes = value
-                    if self.save_pic:
-                        owo.write_bytes_to_file(value, self.pic_name)
+        if namespace.directory:
+            paths = library_scanner.iter_flac_files(namespace.directory)
+        else:
+            paths = [namespace.flac]
 
-            if not key == 'Picture bytes':
-                self.picture_description[key] = value
+        records = flac_verifier.verify(paths, namespace.workers)
+        library_scanner.write_output(records, namespace.output)
 
-        self.result_dict['Picture info'] = self.picture_description
+    if namespace.method == 'check':
+        import frame_checker
+        import library_scanner
 
-    def parse_seektable_block(self, length_of_block):
-        self.seektable = {}
-        local_pointer = self.pointer + 4
-        count_of_seekpoints = length_of_block // 18
+        if namespace.directory:
+            paths = library_scanner.iter_flac_files(namespace.directory)
+        else:
+            paths = [namespace.flac]
 
-        for i in range(count_of_seekpoints):
-            start_sample = self.bytes[local_pointer:local_pointer + 8]
-            offset = self.bytes[local_pointer + 8:local_pointer + 16]
-            number_of_samples = self.bytes[local_pointer + 16:local_pointer + 18]
+        records = frame_checker.check(paths, namespace.workers)
+        library_scanner.write_output(records, namespace.output)
 
-            seekpoint_info = (start_sample, offset, number_of_samples)
+    if namespace.method == 'extract_art':
+        import art_store
+        import library_scanner
 
-            self.seektable['seekpoint{}'.format(i)] = seekpoint_info
+        if namespace.directory:
+            paths = library_scanner.iter_flac_files(namespace.directory)
+        else:
+            paths = [namespace.flac]
 
-        self.result_dict['Seektable'] = self.seektable
+        records = art_store.extract(paths, namespace.art_dir or art_store.DEFAULT_DIRECTORY,
+                                    namespace.workers)
+        library_scanner.write_output(records, namespace.output)
 
-    def parse_vorbis_comment(self, length_of_block):
-        self.vorbis_tags = {}
+    if namespace.method == 'split':
+        import library_scanner
+        import track_splitter
 
-        local_pointer = self.pointer + 4
-        vendor_length = int.from_bytes(self.bytes[local_pointer:local_pointer + 4],
-                                       byteorder='little')
-        local_pointer += 4
-        vendor = self.bytes[local_pointer:local_pointer + vendor_length].decode('utf-8')
+        library_scanner.write_output(track_splitter.split(namespace.flac, namespace.output))
 
-        local_pointer += vendor_length
-        count_of_tags = int.from_bytes(self.bytes[local_pointer:local_pointer + 4],
-                                       byteorder='little')
+    if namespace.method == 'export':
+        import library_scanner
+        import pcm_exporter
 
-        local_pointer += 4
-        for _ in range(count_of_tags):
-            length_of_tag = int.from_bytes(self.bytes[local_pointer:local_pointer + 4],
-                                           byteorder='little')
-            local_pointer += 4
+        if namespace.directory:
+            records = pcm_exporter.export(library_scanner.iter_flac_files(namespace.directory),
+                                          namespace.directory, namespace.output,
+                                          namespace.format, namespace.workers)
+            library_scanner.write_output(records)
 
-            row_tag = self.bytes[local_pointer:local_pointer + length_of_tag].decode('utf-8')
-            tag = row_tag.split('=')
-            self.vorbis_tags[tag[0]] = tag[1]
+        elif namespace.output == '-':
+            pcm_exporter.export_file(namespace.flac, namespace.output, namespace.format)
 
-            local_pointer += length_of_tag
+        else:
+            library_scanner.write_output([pcm_exporter.export_file(
+                namespace.flac, namespace.output, namespace.format)])
 
-        print(vendor)
-        print(self.vorbis_tags)
-        self.result_dict['Vorbis comments'] = self.vorbis_tags
+    if namespace.method == 'tag':
+        from metadata_writer import MetadataWriter
 
-    def parse_streaminfo_block(self, length_of_block):
-        self.streaminfo_dict = {'Minimum block size': 16,
-                                'Maximum block size': 16,
-                                'Minimum frame size': 24,
-                                'Maximum frame size': 24,
-                                'Sample rate in Hz`s': 20,
-                                'Count of channels': 3,
-                                'Bits per sample': 5,
-                                'Total count of samples': 36,
-                                'MD5 signature': 128}
+        writer = MetadataWriter(namespace.flac)
+        for key in namespace.remove_tag:
+            writer.remove_tag(key)
 
-        bits_string = ''
-        for byte in self.bytes[self.pointer + 4:self.pointer + length_of_block + 4]:
-            bits_string += bin(byte)[2:].zfill(8)
+        for tag in namespace.set:
+            key, _, value = tag.partition('=')
+            writer.set_tag(key, value)
 
-        local_pointer = 0
-
-        for key in self.streaminfo_dict.keys():
-            end_of_range = local_pointer + self.streaminfo_dict[key]
-            self.streaminfo_dict[key] = int(bits_string[local_pointer:end_of_range], base=2)
-            local_pointer = end_of_range
-
-        print(self.streaminfo_dict)
-        self.result_dict['Stream info'] = self.streaminfo_dict
-
-    def parse_padding_block(self, length_of_block):
-        pass
+        for tag in namespace.add:
+            key, _, value = tag.partition('=')
+            writer.add_tag(key, value)
 
-    def get_pic_name(self):
-        self.extension = self.picture_description['MIME type'].split('/')[1]
-        self.pic_name = owo.get_free_name('picture.{}'.format(self.extension))
+        if namespace.remove_pictures:
+            writer.remove_pictures()
 
+        if namespace.picture:
+            writer.replace_picture(owo.read_bytes_from_file(namespace.picture))
 
-def create_parser():
-    arg_parser = argparse.ArgumentParser()
-    arg_parser.add_argument('-m', '--method')
-    arg_parser.add_argument('-f', '--flac')
-    arg_parser.add_argument('-sp', '--save_pic', default=False, action='store_true')
+        print('Metadata {}'.format(writer.save()))
 
-    return arg_parser
+    if namespace.method in ('index', 'query'):
+        import library_index
+        import library_scanner
+        from metadata_cache import MetadataCache
 
+        if namespace.method == 'query' and namespace.index and not namespace.directory:
+            index = library_index.LibraryIndex.load(namespace.index)
 
-if __name__ == '__main__':
-    parser = create_parser()
-    namespace = parser.parse_args(sys.argv[1:])
+        elif namespace.records:
+            index = library_index.build_index(library_index.read_records(namespace.records))
 
-    if namespace.method == 'parse_flac':
-        file_bytes = owo.read_bytes_from_file(namespace.flac)
-        if file_bytes[:4] == b'fLaC':
-            parser = Parser(file_bytes[4:], namespace.save_pic)
-            parser.parse_flac()
+        else:
+            cache = MetadataCache(namespace.cache) if namespace.cache else None
+            try:
+                index = library_index.build_index(library_scanner.scan(
+                    namespace.directory, namespace.workers, cache=cache, stats=stats))
+            finally:
+                if cache is not None:
+                    cache.close()
+
+        if namespace.method == 'index':
+            index.save(namespace.index)
+            print('Indexed {} files'.format(len(index)))
 
         else:
-            print('Given file is not FLAC')
+            for path in index.query(namespace.query, namespace.limit):
+                print(path)
+
+    if stats is not None:
+        print(stats.format_summary(), file=sys.stderr)
@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import bisect
+import struct
+from array import array
+from operations_with_bytes_and_bits import BitReader
+
+CHUNK_SIZE = 64 * 1024
+SEEKPOINT = struct.Struct('>QQH')
+PLACEHOLDER_SAMPLE = 0xFFFFFFFFFFFFFFFF
+
+
+class StreamInfo:
+    __slots__ = ('min_block_size', 'max_block_size', 'min_frame_size',
+                 'max_frame_size', 'sample_rate', 'channels',
+                 'bits_per_sample', 'total_samples', 'md5')
+
+    def __init__(self, min_block_size, max_block_size, min_frame_size,
+                 max_frame_size, sample_rate, channels, bits_per_sample,
+                 total_samples, md5):
+        self.min_block_size = min_block_size
+        self.max_block_size = max_block_size
+        self.min_frame_size = min_frame_size
+        self.max_frame_size = max_frame_size
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.bits_per_sample = bits_per_sample
+        self.total_samples = total_samples
+        self.md5 = md5
+
+    @classmethod
+    def from_bytes(cls, data):
+        reader = BitReader(data)
+        return cls(reader.read_bits(16), reader.read_bits(16),
+                   reader.read_bits(24), reader.read_bits(24),
+                   reader.read_bits(20), reader.read_bits(3) + 1,
+                   reader.read_bits(5) + 1, reader.read_bits(36),
+                   reader.read_bits(128))
+
+    def to_bytes(self):
+        value = self.min_block_size
+        value = (value << 16) | self.max_block_size
+        value = (value << 24) | self.min_frame_size
+        value = (value << 24) | self.max_frame_size
+        value = (value << 20) | self.sample_rate
+        value = (value << 3) | (self.channels - 1)
+        value = (value << 5) | (self.bits_per_sample - 1)
+        value = (value << 36) | self.total_samples
+        value = (value << 128) | self.md5
+        return value.to_bytes(34, byteorder='big')
+
+    def to_dict(self):
+        return {'Minimum block size': self.min_block_size,
+                'Maximum block size': self.max_block_size,
+                'Minimum frame size': self.min_frame_size,
+                'Maximum frame size': self.max_frame_size,
+                'Sample rate in Hz`s': self.sample_rate,
+                'Count of channels': self.channels,
+                'Bits per sample': self.bits_per_sample,
+                'Total count of samples': self.total_samples,
+                'MD5 signature': self.md5}
+
+
+class VorbisComment:
+    __slots__ = ('vendor', 'tags')
+
+    def __init__(self, vendor='', tags=None):
+        self.vendor = vendor
+        self.tags = [] if tags is None else tags
+
+    @classmethod
+    def from_bytes(cls, data):
+        vendor_length = int.from_bytes(data[:4], byteorder='little')
+        pointer = 4 + vendor_length
+        vendor = str(data[4:pointer], 'utf-8')
+        count_of_tags = int.from_bytes(data[pointer:pointer + 4], byteorder='little')
+        pointer += 4
+
+        tags = []
+        for _ in range(count_of_tags):
+            length_of_tag = int.from_bytes(data[pointer:pointer + 4], byteorder='little')
+            pointer += 4
+            key, _, value = str(data[pointer:pointer + length_of_tag], 'utf-8').partition('=')
+            tags.append((key, value))
+            pointer += length_of_tag
+
+        if pointer > len(data):
+            raise EOFError('Unexpected end of VORBIS_COMMENT block')
+
+        return cls(vendor, tags)
+
+    def get(self, key):
+        key = key.upper()
+        return [value for tag_key, value in self.tags if tag_key.upper() == key]
+
+    def to_dict(self):
+        values = {}
+        keys = {}
+        for key, value in self.tags:
+            name = keys.setdefault(key.upper(), key)
+            values.setdefault(name, []).append(value)
+
+        return {key: value[0] if len(value) == 1 else value for key, value in values.items()}
+
+
+class IndexPoint:
+    __slots__ = ('offset', 'number', 'reserved')
+
+    def __init__(self, offset, number, reserved=0):
+        self.offset = offset
+        self.number = number
+        self.reserved = reserved
+
+    def to_dict(self):
+        return {'Offset': self.offset,
+                'Index point number': self.number,
+                '~reserved~': self.reserved}
+
+
+class CueTrack:
+    __slots__ = ('offset', 'number', 'isrc', 'is_data', 'pre_emphasis',
+                 'reserved', 'index_points')
+
+    def __init__(self, offset, number, isrc, is_data, pre_emphasis,
+                 reserved=0, index_points=None):
+        self.offset = offset
+        self.number = number
+        self.isrc = isrc
+        self.is_data = is_data
+        self.pre_emphasis = pre_emphasis
+        self.reserved = reserved
+        self.index_points = [] if index_points is None else index_points
+
+    def to_dict(self):
+        return {'Offset': self.offset,
+                'Track number': self.number,
+                'ISRC': self.isrc,
+                'Type': self.is_data,
+                'Pre-emphasis': self.pre_emphasis,
+                '~reserved~': self.reserved,
+                'Index points count': len(self.index_points),
+                'Index points': {'index{}'.format(i): index.to_dict()
+                                 for i, index in enumerate(self.index_points)}}
+
+
+class CueSheet:
+    __slots__ = ('catalog_number', 'lead_in_samples', 'is_cd', 'reserved', 'tracks')
+
+    def __init__(self, catalog_number, lead_in_samples, is_cd, reserved=0, tracks=None):
+        self.catalog_number = catalog_number
+        self.lead_in_samples = lead_in_samples
+        self.is_cd = is_cd
+        self.reserved = reserved
+        self.tracks = [] if tracks is None else tracks
+
+    @classmethod
+    def from_bytes(cls, data):
+        reader = BitReader(data)
+        cuesheet = cls(str(reader.read_bytes(128), 'ascii').rstrip('\x00'),
+                       reader.read_bits(64), reader.read_bits(1),
+                       reader.read_bits(7 + 258 * 8))
+
+        for _ in range(reader.read_bits(8)):
+            track = CueTrack(reader.read_bits(64), reader.read_bits(8),
+                             str(reader.read_bytes(12), 'ascii').rstrip('\x00'),
+                             reader.read_bits(1), reader.read_bits(1),
+                             reader.read_bits(6 + 13 * 8))
+
+            for _ in range(reader.read_bits(8)):
+                track.index_points.append(IndexPoint(reader.read_bits(64), reader.read_bits(8),
+                                                     reader.read_bits(24)))
+
+            cuesheet.tracks.append(track)
+
+        return cuesheet
+
+    def to_dict(self):
+        return {'Media catalog number': self.catalog_number,
+                'Number of lead-in samples': self.lead_in_samples,
+                'Is a compact disk': self.is_cd,
+                '~reserved~': self.reserved,
+                'Tracks count': len(self.tracks),
+                'Tracks': {'track{}'.format(i): track.to_dict()
+                           for i, track in enumerate(self.tracks)}}
+
+
+class Picture:
+    __slots__ = ('picture_type', 'mime_type', 'description', 'width',
+                 'height', 'color_depth', 'colors_count', 'offset', 'length',
+                 'path', 'file', 'data')
+
+    def __init__(self, picture_type, mime_type, description, width, height,
+                 color_depth, colors_count, offset, length, path=None,
+                 file=None, data=None):
+        self.picture_type = picture_type
+        self.mime_type = mime_type
+        self.description = description
+        self.width = width
+        self.height = height
+        self.color_depth = color_depth
+        self.colors_count = colors_count
+        self.offset = offset
+        self.length = length
+        self.path = path
+        self.file = file
+        self.data = data
+
+    @classmethod
+    def from_dict(cls, description, path):
+        return cls(description['Picture type'], description['MIME type'],
+                   description['Description'], description['Width'],
+                   description['Height'], description['Color depth'],
+                   description['Number of used colors'],
+                   description['Picture offset'],
+                   description['Picture bytes'], path)
+
+    @property
+    def extension(self):
+        return self.mime_type.split('/')[-1]
+
+    def read(self):
+        if self.data is not None:
+            return self.data
+
+        return b''.join(self.iter_chunks(self.length or 1))
+
+    def iter_chunks(self, chunk_size=CHUNK_SIZE):
+        if self.data is not None:
+            view = memoryview(self.data)
+            for start in range(0, self.length, chunk_size):
+                yield view[start:start + chunk_size]
+            return
+
+        if self.path is not None:
+            with open(self.path, 'rb') as file:
+                yield from self._read_range(file, chunk_size)
+            return
+
+        if self.file is None:
+            raise ValueError('Picture data is not available from a non-seekable stream')
+
+        position = self.file.tell()
+        try:
+            yield from self._read_range(self.file, chunk_size)
+        finally:
+            self.file.seek(position)
+
+    def _read_range(self, file, chunk_size):
+        file.seek(self.offset)
+        left = self.length
+        while left > 0:
+            chunk = file.read(min(left, chunk_size))
+            if not chunk:
+                raise EOFError('Unexpected end of picture data')
+            left -= len(chunk)
+            yield chunk
+
+    def save_to(self, path, chunk_size=CHUNK_SIZE):
+        with open(path, 'wb') as file:
+            for chunk in self.iter_chunks(chunk_size):
+                file.write(chunk)
+
+    def to_dict(self):
+        return {'Picture type': self.picture_type,
+                'MIME type': self.mime_type,
+                'Description': self.description,
+                'Width': self.width,
+                'Height': self.height,
+                'Color depth': self.color_depth,
+                'Number of used colors': self.colors_count,
+                'Picture offset': self.offset,
+                'Picture bytes': self.length}
+
+
+class SeekTable:
+    __slots__ = ('samples', 'offsets', 'counts', 'placeholders')
+
+    def __init__(self):
+        self.samples = array('Q')
+        self.offsets = array('Q')
+        self.counts = array('H')
+        self.placeholders = 0
+
+    @classmethod
+    def from_bytes(cls, data):
+        seektable = cls()
+        points_count = len(data) // SEEKPOINT.size
+
+        for sample, offset, count in SEEKPOINT.iter_unpack(data[:points_count * SEEKPOINT.size]):
+            if sample == PLACEHOLDER_SAMPLE:
+                seektable.placeholders += 1
+                continue
+
+            seektable.samples.append(sample)
+            seektable.offsets.append(offset)
+            seektable.counts.append(count)
+
+        return seektable
+
+    def __len__(self):
+        return len(self.samples)
+
+    def seek(self, sample):
+        index = bisect.bisect_right(self.samples, sample) - 1
+        if index < 0:
+            return None
+
+        return self.samples[index], self.offsets[index]
+
+    def to_dict(self):
+        return {'Seekpoints count': len(self),
+                'Placeholders count': self.placeholders,
+                'Sample numbers': self.samples.tolist(),
+                'Offsets': self.offsets.tolist(),
+                'Samples in frames': self.counts.tolist()}
+
+
+def make_serializable(value):
+    if isinstance(value, dict):
+        return {key: make_serializable(value[key]) for key in value.keys()}
+
+    if isinstance(value, (list, tuple)):
+        return [make_serializable(item) for item in value]
+
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+
+    if hasattr(value, 'to_dict'):
+        return make_serializable(value.to_dict())
+
+    return value
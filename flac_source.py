@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import io
+import mmap
+import os
+
+CHUNK_SIZE = 64 * 1024
+
+
+class StreamSource:
+    is_mapped = False
+
+    def __init__(self, file, path=None, close_file=False, chunk_size=CHUNK_SIZE):
+        self.file = file
+        self.path = path
+        self.close_file = close_file
+        self.chunk_size = chunk_size
+        self.seekable = hasattr(file, 'seekable') and file.seekable()
+        self.start = file.tell() if self.seekable else 0
+        self.position = 0
+
+    def read(self, length):
+        data = self.file.read(length)
+        if len(data) < length:
+            parts = [data]
+            received = len(data)
+            while received < length:
+                part = self.file.read(length - received)
+                if not part:
+                    raise EOFError('Unexpected end of FLAC stream')
+                parts.append(part)
+                received += len(part)
+            data = b''.join(parts)
+
+        self.position += length
+        return data
+
+    def skip(self, length):
+        if self.seekable:
+            self.file.seek(length, io.SEEK_CUR)
+            self.position += length
+            return
+
+        while length > 0:
+            length -= len(self.read(min(length, self.chunk_size)))
+
+    def take(self, length):
+        self.skip(length)
+        return None
+
+    def copy_to(self, length, file):
+        while length > 0:
+            chunk = self.read(min(length, self.chunk_size))
+            file.write(chunk)
+            length -= len(chunk)
+
+    def close(self):
+        if self.close_file:
+            self.file.close()
+
+
+class BufferSource:
+    def __init__(self, buffer, path=None, file=None, close_file=False, start=0):
+        self.buffer = buffer
+        self.view = memoryview(buffer).cast('B')[start:]
+        self.path = path
+        self.file = file
+        self.close_file = close_file
+        self.seekable = True
+        self.start = start
+        self.position = 0
+
+    def read(self, length):
+        end = self.position + length
+        if end > len(self.view):
+            raise EOFError('Unexpected end of FLAC stream')
+
+        data = self.view[self.position:end]
+        self.position = end
+        return data
+
+    def skip(self, length):
+        self.read(length)
+
+    def take(self, length):
+        return self.read(length)
+
+    def copy_to(self, length, file):
+        file.write(self.read(length))
+
+    @property
+    def is_mapped(self):
+        return isinstance(self.buffer, mmap.mmap)
+
+    def close(self):
+        self.view.release()
+        try:
+            if self.is_mapped:
+                try:
+                    self.buffer.close()
+                except BufferError:
+                    raise BufferError('Memory map is still referenced by a view taken from '
+                                      'the source; copy the data before closing')
+        finally:
+            if self.close_file:
+                self.file.close()
+
+
+def map_file(file, path=None, close_file=False):
+    try:
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        return StreamSource(file, path=path, close_file=close_file)
+
+    return BufferSource(mapping, path=path, file=file, close_file=close_file,
+                        start=file.tell())
+
+
+def open_source(source, use_mmap=False):
+    if isinstance(source, (StreamSource, BufferSource)):
+        return source
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return BufferSource(source)
+
+    if isinstance(source, (str, os.PathLike)):
+        file = open(source, 'rb')
+        if use_mmap:
+            return map_file(file, path=os.fspath(source), close_file=True)
+
+        return StreamSource(file, path=os.fspath(source), close_file=True)
+
+    if use_mmap:
+        return map_file(source)
+
+    return StreamSource(source)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+
+BLOCK = 'block'
+IO = 'io'
+FILE = 'file'
+
+
+class Counter:
+    __slots__ = ('count', 'bytes', 'wall', 'cpu')
+
+    def __init__(self):
+        self.count = 0
+        self.bytes = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+
+    def add(self, count, size, wall, cpu):
+        self.count += count
+        self.bytes += size
+        self.wall += wall
+        self.cpu += cpu
+
+    def to_dict(self):
+        return {'Count': self.count,
+                'Bytes': self.bytes,
+                'Wall seconds': round(self.wall, 6),
+                'CPU seconds': round(self.cpu, 6)}
+
+
+class ParseStats:
+    def __init__(self, hook=None):
+        self.hook = hook
+        self.counters = {BLOCK: {}, IO: {}, FILE: {}}
+
+    def __getstate__(self):
+        return {'hook': None, 'counters': self.counters}
+
+    def __setstate__(self, state):
+        self.hook = state['hook']
+        self.counters = state['counters']
+
+    def record(self, kind, name, size, wall, cpu, count=1):
+        counters = self.counters[kind]
+        if name not in counters:
+            counters[name] = Counter()
+
+        counters[name].add(count, size, wall, cpu)
+        if self.hook is not None:
+            self.hook(kind, name, count, size, wall, cpu)
+
+    def merge(self, other):
+        for kind in other.counters.keys():
+            for name, counter in other.counters[kind].items():
+                self.record(kind, name, counter.bytes, counter.wall, counter.cpu, counter.count)
+
+    def get(self, kind, name):
+        return self.counters[kind].get(name)
+
+    def to_dict(self):
+        return {'Files': {name: counter.to_dict() for name, counter in self.counters[FILE].items()},
+                'Blocks': {name: counter.to_dict() for name, counter in self.counters[BLOCK].items()},
+                'I/O': {name: counter.to_dict() for name, counter in self.counters[IO].items()}}
+
+    def format_summary(self):
+        lines = ['{:<16}{:>10}{:>14}{:>12}{:>12}'.format('', 'count', 'bytes', 'wall ms', 'cpu ms')]
+        for title, kind in (('Files', FILE), ('Blocks', BLOCK), ('I/O', IO)):
+            if not self.counters[kind]:
+                continue
+
+            lines.append(title)
+            for name, counter in self.counters[kind].items():
+                lines.append('  {:<14}{:>10}{:>14}{:>12.3f}{:>12.3f}'.format(
+                    name, counter.count, counter.bytes, counter.wall * 1000, counter.cpu * 1000))
+
+        return '\n'.join(lines)
+
+
+class InstrumentedSource:
+    def __init__(self, source, stats):
+        self.source = source
+        self.stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self.source, name)
+
+    def call(self, name, function, length, *args):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        result = function(length, *args)
+        self.stats.record(IO, name, length, time.perf_counter() - wall, time.process_time() - cpu)
+        return result
+
+    def read(self, length):
+        return self.call('read', self.source.read, length)
+
+    def skip(self, length):
+        return self.call('skip', self.source.skip, length)
+
+    def take(self, length):
+        return self.call('take', self.source.take, length)
+
+    def copy_to(self, length, file):
+        return self.call('copy_to', self.source.copy_to, length, file)
+
+    def close(self):
+        self.source.close()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import operations_with_processes as owp
+from flac_decoder import Decoder
+
+SAMPLE_DTYPES = {1: '<i1', 2: '<i2', 4: '<i4'}
+
+
+def get_sample_bytes(samples, bits_per_sample):
+    bytes_per_sample = (bits_per_sample + 7) // 8
+    if bytes_per_sample in SAMPLE_DTYPES:
+        return samples.astype(SAMPLE_DTYPES[bytes_per_sample]).tobytes()
+
+    little_endian = samples.astype('<i4').view('u1').reshape(-1, 4)
+    return little_endian[:, :bytes_per_sample].tobytes()
+
+
+def compute_md5(decoder):
+    md5 = hashlib.md5()
+    bits_per_sample = decoder.stream.bits_per_sample
+    for samples in decoder:
+        md5.update(get_sample_bytes(samples, bits_per_sample))
+
+    return md5.digest()
+
+
+def verify_file(path):
+    try:
+        decoder = Decoder(path)
+        stored = decoder.stream.md5.to_bytes(16, byteorder='big')
+        if not decoder.stream.md5:
+            return {'path': path, 'status': 'unset'}
+
+        computed = compute_md5(decoder)
+
+    except Exception as error:
+        return {'path': path, 'status': 'error',
+                'error': '{}: {}'.format(type(error).__name__, error)}
+
+    return {'path': path,
+            'status': 'pass' if computed == stored else 'fail',
+            'stored': stored.hex(),
+            'computed': computed.hex()}
+
+
+def verify(paths, workers=None):
+    return owp.map_unordered(verify_file, paths, workers)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import frame_scanner
+import operations_with_processes as owp
+from operations_with_bytes_and_bits import CRC16_TABLE, crc16, crc16_shift
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BATCH_BYTES = 1024 * 1024
+SEGMENT = 128
+
+_shift_tables = None
+
+
+def get_shift_tables():
+    global _shift_tables
+    if _shift_tables is None:
+        high = [crc16_shift(byte << 8, SEGMENT) for byte in range(256)]
+        low = [crc16_shift(byte, SEGMENT) for byte in range(256)]
+        word_high = np.array([crc16_shift(crc, 1) for crc in CRC16_TABLE], dtype=np.uint16)
+        word_table = (word_high[:, None] ^ np.array(CRC16_TABLE, dtype=np.uint16)).ravel()
+        _shift_tables = (word_table, np.array(high, dtype=np.int32), np.array(low, dtype=np.int32))
+
+    return _shift_tables
+
+
+def crc16_frames(buffer, starts, lengths):
+    if np is None:
+        return [crc16(buffer[start:start + length]) for start, length in zip(starts, lengths)]
+
+    word_table, high, low = get_shift_tables()
+    buffer = np.frombuffer(buffer, dtype=np.uint8)
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    if not len(lengths):
+        return np.zeros(0, dtype=np.int32)
+
+    counts = (lengths + SEGMENT - 1) // SEGMENT
+    first_segments = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    destinations = (first_segments + counts) * SEGMENT - lengths
+
+    padded = np.zeros(int(counts.sum()) * SEGMENT, dtype=np.uint8)
+    for start, length, destination in zip(starts.tolist(), lengths.tolist(), destinations.tolist()):
+        padded[destination:destination + length] = buffer[start:start + length]
+
+    segments = np.zeros(len(padded) // SEGMENT, dtype=np.uint16)
+    for column in padded.view('>u2').reshape(-1, SEGMENT // 2).T.astype(np.uint16):
+        segments = word_table[column ^ segments]
+
+    segments = segments.astype(np.int32)
+
+    crcs = np.zeros(len(lengths), dtype=np.int32)
+    for step in range(int(counts.max())):
+        active = np.flatnonzero(counts > step)
+        crc = crcs[active]
+        crcs[active] = high[crc >> 8] ^ low[crc & 0xFF] ^ segments[first_segments[active] + step]
+
+    return crcs
+
+
+def find_frame_end(data, start):
+    crc = 0
+    position = 0
+    index = data.find(b'\xff', start + 2)
+    while 0 <= index < len(data) - 1:
+        if data[index + 1] & 0xFE == 0xF8:
+            crc = crc16(data[position:index - 2], crc)
+            position = index - 2
+            if crc == int.from_bytes(data[index - 2:index], byteorder='big'):
+                return index
+
+        index = data.find(b'\xff', index + 1)
+
+    return None
+
+
+def check_batch(frames, resynced):
+    data = b''.join(frame_data for _, frame_data in frames)
+    starts = []
+    lengths = []
+    position = 0
+    for header, frame_data in frames:
+        starts.append(position)
+        lengths.append(max(len(frame_data) - 2, 0))
+        position += len(frame_data)
+
+    crcs = crc16_frames(data, starts, lengths)
+
+    damaged = []
+    ranges = []
+    for (header, frame_data), length, crc in zip(frames, lengths, crcs):
+        end = header.offset + len(frame_data)
+        stored = frame_data[length:length + 2]
+        if len(stored) == 2 and int(crc) == int.from_bytes(stored, byteorder='big'):
+            if header.offset in resynced:
+                ranges.append([end, end])
+            continue
+
+        if header.offset not in resynced:
+            damaged.append(header.offset)
+            continue
+
+        frame_end = find_frame_end(frame_data, header.header_length)
+        if frame_end is None:
+            ranges.append([header.offset, end])
+        else:
+            ranges.append([header.offset + frame_end, end])
+
+    return damaged, ranges
+
+
+def check_file(path, batch_bytes=BATCH_BYTES):
+    try:
+        stream, audio_offset = frame_scanner.read_stream(path)
+        damaged = []
+        ranges = []
+        frames = 0
+        previous = None
+
+        with open(path, 'rb') as file:
+            batch = []
+            batch_size = 0
+            resynced = set()
+            scanner = frame_scanner.FrameScanner(file, audio_offset, stream, with_data=True)
+            for header, data in scanner:
+                frames += 1
+                if previous is not None and \
+                        header.sample_number != previous.sample_number + previous.block_size:
+                    resynced.add(previous.offset)
+
+                if batch_size >= batch_bytes:
+                    batch_damaged, batch_ranges = check_batch(batch, resynced)
+                    damaged.extend(batch_damaged)
+                    ranges.extend(batch_ranges)
+                    batch = []
+                    batch_size = 0
+                    resynced = set()
+
+                previous = header
+                batch.append((header, data))
+                batch_size += len(data)
+
+            if batch:
+                batch_damaged, batch_ranges = check_batch(batch, resynced)
+                damaged.extend(batch_damaged)
+                ranges.extend(batch_ranges)
+
+            if frames and scanner.audio_end < scanner.trailer_offset:
+                ranges.append([scanner.audio_end, scanner.trailer_offset])
+
+    except Exception as error:
+        return {'path': path, 'status': 'error',
+                'error': '{}: {}'.format(type(error).__name__, error)}
+
+    if not frames:
+        return {'path': path, 'status': 'error', 'error': 'No audio frames found'}
+
+    samples = previous.sample_number + previous.block_size
+    truncated = bool(stream.total_samples) and samples < stream.total_samples
+
+    return {'path': path,
+            'status': 'damaged' if damaged or ranges or truncated else 'ok',
+            'frames': frames,
+            'damaged frames': damaged,
+            'damaged ranges': ranges,
+            'truncated': truncated}
+
+
+def check(paths, workers=None):
+    return owp.map_unordered(check_file, paths, workers)
@@ -0,0 +1,384 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import bisect
+from array import array
+from flac_core import Parser
+from operations_with_bytes_and_bits import crc8, iter_crc16_ends, read_utf8_number
+
+CHUNK_SIZE = 1024 * 1024
+MAX_HEADER_LENGTH = 16
+ID3V1_SIZE = 128
+APE_FOOTER_SIZE = 32
+APE_HAS_HEADER = 0x80000000
+
+BLOCK_SIZES = {1: 192, 2: 576, 3: 1152, 4: 2304, 5: 4608,
+               8: 256, 9: 512, 10: 1024, 11: 2048,
+               12: 4096, 13: 8192, 14: 16384, 15: 32768}
+
+SAMPLE_RATES = {1: 88200, 2: 176400, 3: 192000, 4: 8000, 5: 16000,
+                6: 22050, 7: 24000, 8: 32000, 9: 44100, 10: 48000,
+                11: 96000}
+
+SAMPLE_SIZES = {1: 8, 2: 12, 4: 16, 5: 20, 6: 24, 7: 32}
+
+INDEPENDENT, LEFT_SIDE, RIGHT_SIDE, MID_SIDE = range(4)
+
+
+class FrameHeader:
+    __slots__ = ('offset', 'is_variable', 'block_size', 'sample_rate',
+                 'channel_assignment', 'channels', 'bits_per_sample',
+                 'number', 'sample_number', 'header_length', 'size')
+
+    def get_decorrelation(self):
+        if self.channel_assignment < 8:
+            return INDEPENDENT
+
+        return self.channel_assignment - 7
+
+
+def parse_frame_header(data, position, stream):
+    if data[position] != 0xFF or data[position + 1] & 0xFE != 0xF8:
+        return None
+
+    block_size_code = data[position + 2] >> 4
+    sample_rate_code = data[position + 2] & 0x0F
+    channel_assignment = data[position + 3] >> 4
+    sample_size_code = (data[position + 3] >> 1) & 0x07
+
+    if (block_size_code == 0 or sample_rate_code == 15 or channel_assignment > 10
+            or sample_size_code == 3 or data[position + 3] & 1):
+        return None
+
+    try:
+        number, number_length = read_utf8_number(data, position + 4)
+    except ValueError:
+        return None
+
+    pointer = position + 4 + number_length
+
+    if block_size_code == 6:
+        block_size = data[pointer] + 1
+        pointer += 1
+    elif block_size_code == 7:
+        block_size = int.from_bytes(data[pointer:pointer + 2], byteorder='big') + 1
+        pointer += 2
+    else:
+        block_size = BLOCK_SIZES[block_size_code]
+
+    if sample_rate_code == 0:
+        sample_rate = stream.sample_rate
+    elif sample_rate_code == 12:
+        sample_rate = data[pointer] * 1000
+        pointer += 1
+    elif sample_rate_code == 13:
+        sample_rate = int.from_bytes(data[pointer:pointer + 2], byteorder='big')
+        pointer += 2
+    elif sample_rate_code == 14:
+        sample_rate = int.from_bytes(data[pointer:pointer + 2], byteorder='big') * 10
+        pointer += 2
+    else:
+        sample_rate = SAMPLE_RATES[sample_rate_code]
+
+    if crc8(data[position:pointer]) != data[pointer]:
+        return None
+
+    header = FrameHeader()
+    header.is_variable = bool(data[position + 1] & 1)
+    header.block_size = block_size
+    header.sample_rate = sample_rate
+    header.channel_assignment = channel_assignment
+    header.channels = channel_assignment + 1 if channel_assignment < 8 else 2
+    header.bits_per_sample = SAMPLE_SIZES.get(sample_size_code, stream.bits_per_sample)
+    header.number = number
+    header.header_length = pointer + 1 - position
+    header.size = 0
+
+    return header
+
+
+def is_consistent(header, stream):
+    if header.channels != stream.channels:
+        return False
+
+    if header.bits_per_sample != stream.bits_per_sample:
+        return False
+
+    if stream.sample_rate and header.sample_rate != stream.sample_rate:
+        return False
+
+    return not stream.max_block_size or header.block_size <= stream.max_block_size
+
+
+def get_trailer_offset(file, start, end):
+    while True:
+        if end - start >= ID3V1_SIZE:
+            file.seek(end - ID3V1_SIZE)
+            if file.read(3) == b'TAG':
+                end -= ID3V1_SIZE
+                continue
+
+        if end - start >= APE_FOOTER_SIZE:
+            file.seek(end - APE_FOOTER_SIZE)
+            footer = file.read(APE_FOOTER_SIZE)
+            if footer[:8] == b'APETAGEX':
+                size = int.from_bytes(footer[12:16], byteorder='little')
+                flags = int.from_bytes(footer[20:24], byteorder='little')
+                if flags & APE_HAS_HEADER:
+                    size += APE_FOOTER_SIZE
+                if APE_FOOTER_SIZE <= size <= end - start:
+                    end -= size
+                    continue
+
+        return end
+
+
+class FrameScanner:
+    def __init__(self, file, audio_offset, stream, chunk_size=CHUNK_SIZE, with_data=False):
+        self.file = file
+        self.audio_offset = audio_offset
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.with_data = with_data
+        self.buffer = bytearray()
+        self.buffer_start = audio_offset
+        self.keep_from = audio_offset
+        self.eof = False
+        self.nominal_block_size = None
+        self.gaps = 0
+        self.audio_end = None
+        self.trailer_offset = None
+
+        if stream.min_block_size == stream.max_block_size:
+            self.nominal_block_size = stream.max_block_size
+
+        self.file.seek(audio_offset)
+
+    def fill(self):
+        if self.eof:
+            return False
+
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+
+        drop = min(self.keep_from - self.buffer_start, len(self.buffer))
+        if drop > 0:
+            del self.buffer[:drop]
+            self.buffer_start += drop
+
+        self.buffer += chunk
+        return True
+
+    def find_header(self, offset):
+        while True:
+            index = self.buffer.find(b'\xff', offset - self.buffer_start)
+            if index < 0:
+                offset = max(offset, self.buffer_start + len(self.buffer))
+                if not self.fill():
+                    return None
+                continue
+
+            if index + MAX_HEADER_LENGTH > len(self.buffer) and self.fill():
+                continue
+
+            try:
+                header = parse_frame_header(self.buffer, index, self.stream)
+            except (IndexError, EOFError):
+                header = None
+
+            position = self.buffer_start + index
+            if header is not None and is_consistent(header, self.stream):
+                header.offset = position
+                self.set_sample_number(header)
+                return header
+
+            offset = position + 1
+
+    def set_sample_number(self, header):
+        if header.is_variable:
+            header.sample_number = header.number
+            return
+
+        if self.nominal_block_size is None:
+            self.nominal_block_size = header.block_size
+
+        header.sample_number = header.number * self.nominal_block_size
+
+    def follows(self, header, previous):
+        if header.is_variable != previous.is_variable:
+            return False
+
+        return header.sample_number == previous.sample_number + previous.block_size
+
+    def is_confirmed(self, header):
+        follower = self.find_header(self.get_next_offset(header))
+        return follower is None or self.follows(follower, header)
+
+    def get_next_offset(self, header):
+        return header.offset + max(header.header_length, self.stream.min_frame_size)
+
+    def find_last_frame_end(self, header):
+        if self.with_data:
+            while self.fill():
+                pass
+            eof = self.buffer_start + len(self.buffer)
+            start = header.offset - self.buffer_start
+            data = self.buffer[start:start + self.chunk_size]
+        else:
+            eof = self.file.seek(0, 2)
+            self.file.seek(header.offset)
+            data = self.file.read(self.chunk_size)
+
+        trailer_offset = get_trailer_offset(self.file, header.offset + header.header_length, eof)
+        first = None
+        for end in iter_crc16_ends(data, header.header_length):
+            end += header.offset
+            if end == eof:
+                trailer_offset = eof
+                break
+
+            if end == trailer_offset:
+                break
+
+            if first is None:
+                first = end
+        else:
+            end = trailer_offset if first is None else first
+
+        self.audio_end = end
+        self.trailer_offset = trailer_offset
+        return end
+
+    def finish(self, header, end):
+        header.size = end - header.offset
+        if not self.with_data:
+            return header
+
+        start = header.offset - self.buffer_start
+        return header, bytes(self.buffer[start:start + header.size])
+
+    def __iter__(self):
+        previous = None
+        offset = self.audio_offset
+
+        while True:
+            if not self.with_data or previous is None:
+                self.keep_from = offset
+
+            header = self.find_header(offset)
+            if header is None:
+                break
+
+            if previous is not None and not self.follows(header, previous):
+                expected = previous.sample_number + previous.block_size
+                if (header.is_variable != previous.is_variable
+                        or header.sample_number < expected
+                        or not self.is_confirmed(header)):
+                    offset = header.offset + 1
+                    continue
+
+                self.gaps += 1
+
+            if previous is not None:
+                yield self.finish(previous, header.offset)
+
+            previous = header
+            self.keep_from = header.offset
+            offset = self.get_next_offset(header)
+
+        if previous is not None:
+            yield self.finish(previous, self.find_last_frame_end(previous))
+
+
+class FrameIndex:
+    def __init__(self, stream=None):
+        self.stream = stream
+        self.samples = array('Q')
+        self.offsets = array('Q')
+        self.block_sizes = array('I')
+        self.frame_sizes = array('I')
+        self.gaps = 0
+
+    def append(self, header):
+        self.samples.append(header.sample_number)
+        self.offsets.append(header.offset)
+        self.block_sizes.append(header.block_size)
+        self.frame_sizes.append(header.size)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def seek(self, sample):
+        index = bisect.bisect_right(self.samples, sample) - 1
+        if index < 0:
+            return None
+
+        return self.samples[index], self.offsets[index]
+
+    def get_total_samples(self):
+        if not self.samples:
+            return 0
+
+        return self.samples[-1] + self.block_sizes[-1]
+
+    def get_duration(self):
+        if not self.stream or not self.stream.sample_rate:
+            return 0.0
+
+        return self.get_total_samples() / self.stream.sample_rate
+
+    def get_audio_size(self):
+        if not self.offsets:
+            return 0
+
+        return self.offsets[-1] + self.frame_sizes[-1] - self.offsets[0]
+
+    def get_bitrate(self):
+        duration = self.get_duration()
+        if not duration:
+            return 0
+
+        return int(self.get_audio_size() * 8 / duration)
+
+    def to_dict(self):
+        return {'Frames count': len(self),
+                'Total count of samples': self.get_total_samples(),
+                'Duration in seconds': round(self.get_duration(), 3),
+                'Audio bytes': self.get_audio_size(),
+                'Average bitrate': self.get_bitrate(),
+                'Minimum frame size': min(self.frame_sizes, default=0),
+                'Maximum frame size': max(self.frame_sizes, default=0),
+                'Gaps': self.gaps}
+
+
+def read_stream(path):
+    with Parser(path, block_types=['STREAMINFO']) as parser:
+        if not parser.parse_flac():
+            raise ValueError('Given file is not FLAC')
+
+        audio_offset = parser.skip_to_audio()
+        if parser.streaminfo is None:
+            raise ValueError('STREAMINFO block is missing')
+
+        return parser.streaminfo, audio_offset
+
+
+def iter_frames(path, with_data=False, chunk_size=CHUNK_SIZE):
+    stream, audio_offset = read_stream(path)
+    with open(path, 'rb') as file:
+        yield from FrameScanner(file, audio_offset, stream, chunk_size, with_data)
+
+
+def build_frame_index(path, chunk_size=CHUNK_SIZE):
+    stream, audio_offset = read_stream(path)
+    index = FrameIndex(stream)
+
+    with open(path, 'rb') as file:
+        scanner = FrameScanner(file, audio_offset, stream, chunk_size)
+        for header in scanner:
+            index.append(header)
+
+    index.gaps = scanner.gaps
+    return index
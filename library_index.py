@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import bisect
+import json
+import pickle
+import re
+import unicodedata
+from array import array
+import numpy as np
+
+INDEX_VERSION = 1
+
+NUMERIC_FIELDS = {'sample_rate': 'Sample rate in Hz`s',
+                  'channels': 'Count of channels',
+                  'bits_per_sample': 'Bits per sample',
+                  'total_samples': 'Total count of samples',
+                  'min_block_size': 'Minimum block size',
+                  'max_block_size': 'Maximum block size',
+                  'min_frame_size': 'Minimum frame size',
+                  'max_frame_size': 'Maximum frame size'}
+
+MISSING = -1
+
+CONDITION = re.compile(r'^\s*([^=<>~]+?)\s*(>=|<=|=|<|>|~)\s*(.*?)\s*$')
+
+
+def normalize(value):
+    return unicodedata.normalize('NFKC', str(value)).casefold().strip()
+
+
+def normalize_key(key):
+    return key.strip().upper()
+
+
+def iter_tags(comments):
+    for key, values in comments.items():
+        if not isinstance(values, list):
+            values = [values]
+
+        for value in values:
+            yield normalize_key(key), value
+
+
+def parse_condition(text):
+    match = CONDITION.match(text)
+    if match is None:
+        raise ValueError('Invalid condition {!r}'.format(text))
+
+    field, operator, value = match.groups()
+    if field.lower() in NUMERIC_FIELDS:
+        if operator == '~':
+            raise ValueError('Operator ~ is not supported for {}'.format(field))
+
+        return field.lower(), operator, int(value)
+
+    if operator not in ('=', '~'):
+        raise ValueError('Operator {} is not supported for tag {}'.format(operator, field))
+
+    return normalize_key(field), operator, normalize(value)
+
+
+def as_documents(postings):
+    return np.frombuffer(postings, dtype=np.uint32)
+
+
+def contains(postings, documents):
+    if not len(documents) or not len(postings):
+        return np.zeros(len(documents), dtype=bool)
+
+    positions = np.minimum(np.searchsorted(postings, documents), len(postings) - 1)
+    return postings[positions] == documents
+
+
+class LibraryIndex:
+    def __init__(self):
+        self.paths = []
+        self.columns = {field: array('q') for field in NUMERIC_FIELDS.keys()}
+        self.tags = {}
+        self.sorted_columns = None
+
+    def __len__(self):
+        return len(self.paths)
+
+    def add(self, record):
+        if 'result' not in record:
+            return False
+
+        document = len(self.paths)
+        self.paths.append(record['path'])
+
+        streaminfo = record['result'].get('Stream info', {})
+        for field, name in NUMERIC_FIELDS.items():
+            self.columns[field].append(streaminfo.get(name, MISSING))
+
+        seen = set()
+        for key, value in iter_tags(record['result'].get('Vorbis comments', {})):
+            value = normalize(value)
+            if (key, value) in seen:
+                continue
+
+            seen.add((key, value))
+            self.tags.setdefault(key, {}).setdefault(value, array('I')).append(document)
+
+        self.sorted_columns = None
+        return True
+
+    def update(self, records):
+        for record in records:
+            self.add(record)
+
+        return self
+
+    def get_sorted_column(self, field):
+        if self.sorted_columns is None:
+            self.sorted_columns = {}
+
+        if field not in self.sorted_columns:
+            column = self.columns[field]
+            order = array('I', sorted(range(len(column)), key=column.__getitem__))
+            values = array('q', (column[document] for document in order))
+            self.sorted_columns[field] = (values, order)
+
+        return self.sorted_columns[field]
+
+    def get_bounds(self, field, operator, value):
+        values, order = self.get_sorted_column(field)
+        start, end = bisect.bisect_right(values, MISSING), len(values)
+        if operator in ('=', '>='):
+            start = bisect.bisect_left(values, value)
+        elif operator == '>':
+            start = bisect.bisect_right(values, value)
+
+        if operator in ('=', '<='):
+            end = bisect.bisect_right(values, value)
+        elif operator == '<':
+            end = bisect.bisect_left(values, value)
+
+        return order, start, max(start, end)
+
+    def get_postings(self, key, operator, value):
+        values = self.tags.get(key, {})
+        if operator == '=':
+            return [values.get(value, array('I'))]
+
+        return [postings for text, postings in values.items() if value in text]
+
+    def estimate(self, condition):
+        field, operator, value = condition
+        if field in NUMERIC_FIELDS:
+            order, start, end = self.get_bounds(field, operator, value)
+            return end - start
+
+        return sum(len(postings) for postings in self.get_postings(field, operator, value))
+
+    def get_candidates(self, condition):
+        field, operator, value = condition
+        if field in NUMERIC_FIELDS:
+            order, start, end = self.get_bounds(field, operator, value)
+            return np.sort(as_documents(order)[start:end])
+
+        lists = [as_documents(postings) for postings in self.get_postings(field, operator, value)]
+        if len(lists) == 1:
+            return lists[0]
+
+        return np.unique(np.concatenate(lists or [np.zeros(0, dtype=np.uint32)]))
+
+    def filter(self, documents, condition):
+        field, operator, value = condition
+        if field in NUMERIC_FIELDS:
+            values = np.frombuffer(self.columns[field], dtype=np.int64)[documents]
+            if operator == '=':
+                mask = values == value
+            elif operator == '<':
+                mask = (values > MISSING) & (values < value)
+            elif operator == '<=':
+                mask = (values > MISSING) & (values <= value)
+            elif operator == '>':
+                mask = values > value
+            else:
+                mask = values >= value
+
+            return documents[mask]
+
+        mask = np.zeros(len(documents), dtype=bool)
+        for postings in self.get_postings(field, operator, value):
+            mask |= contains(as_documents(postings), documents)
+
+        return documents[mask]
+
+    def query(self, conditions, limit=None):
+        conditions = [parse_condition(condition) if isinstance(condition, str) else condition
+                      for condition in conditions]
+        if not conditions:
+            documents = range(len(self.paths))[:limit]
+        else:
+            conditions.sort(key=self.estimate)
+            documents = self.get_candidates(conditions[0])
+            for condition in conditions[1:]:
+                if not len(documents):
+                    break
+                documents = self.filter(documents, condition)
+
+            documents = documents[:limit].tolist()
+
+        return [self.paths[document] for document in documents]
+
+    def get_values(self, key):
+        return sorted(self.tags.get(normalize_key(key), {}).keys())
+
+    def save(self, path):
+        for field in NUMERIC_FIELDS.keys():
+            self.get_sorted_column(field)
+
+        with open(path, 'wb') as file:
+            pickle.dump((INDEX_VERSION, self.paths, self.columns, self.tags,
+                         self.sorted_columns), file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            state = pickle.load(file)
+
+        if state[0] != INDEX_VERSION:
+            raise ValueError('Unsupported index version {}'.format(state[0]))
+
+        index = cls()
+        index.paths, index.columns, index.tags, index.sorted_columns = state[1:]
+        return index
+
+
+def read_records(path):
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def build_index(records):
+    return LibraryIndex().update(records)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import functools
+import json
+import os
+import sys
+import operations_with_processes as owp
+from flac_core import Parser
+from flac_stats import ParseStats
+from flac_records import make_serializable
+
+BATCH_SIZE = 32
+NOT_FLAC = 'Given file is not FLAC'
+
+
+def iter_flac_files(root):
+    directories = [root]
+    while directories:
+        directory = directories.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+
+        for entry in sorted(entries, key=lambda entry: entry.name):
+            if entry.is_dir(follow_symlinks=False):
+                directories.append(entry.path)
+            elif entry.name.lower().endswith('.flac') and entry.is_file():
+                yield entry.path
+
+
+def parse_file(path, block_types=None, stats=None):
+    try:
+        with Parser(path, block_types=block_types, stats=stats) as parser:
+            if not parser.parse_flac():
+                return {'path': path, 'error': NOT_FLAC}
+
+            return {'path': path, 'result': make_serializable(parser.result_dict)}
+
+    except Exception as error:
+        return {'path': path, 'error': '{}: {}'.format(type(error).__name__, error)}
+
+
+def is_cacheable(record):
+    return 'result' in record or record.get('error') == NOT_FLAC
+
+
+def parse_files(paths, block_types=None, with_stats=False):
+    if not with_stats:
+        return [parse_file(path, block_types) for path in paths]
+
+    stats = ParseStats()
+    records = [parse_file(path, block_types, stats) for path in paths]
+    return records, stats
+
+
+def scan(root, workers=None, block_types=None, cache=None, batch_size=BATCH_SIZE, stats=None):
+    root = os.path.abspath(root)
+    function = functools.partial(parse_files, block_types=block_types,
+                                 with_stats=stats is not None)
+    keys = {}
+
+    def store(batches):
+        for records in batches:
+            if stats is not None:
+                records, batch_stats = records
+                stats.merge(batch_stats)
+
+            for record in records:
+                key = keys.pop(record['path'])
+                if cache is not None and is_cacheable(record):
+                    cache.put(key, record, block_types)
+                yield record
+
+    with owp.BoundedPool(function, workers) as pool:
+        batch = []
+        for path in iter_flac_files(root):
+            try:
+                key = cache.get_key(path) if cache is not None else (path,)
+            except OSError as error:
+                yield {'path': path, 'error': '{}: {}'.format(type(error).__name__, error)}
+                continue
+
+            if cache is not None:
+                cache.mark_seen(key)
+                record = cache.get(key, block_types)
+                if record is not None:
+                    yield record
+                    continue
+
+            keys[path] = key
+            batch.append(path)
+            if len(batch) >= batch_size:
+                yield from store(pool.submit(batch))
+                batch = []
+
+        if batch:
+            yield from store(pool.submit(batch))
+
+        yield from store(pool.drain())
+
+    if cache is not None:
+        cache.prune(root)
+
+
+def serve(input_file=None, output_file=None, block_types=None, stats=None):
+    input_file = input_file or sys.stdin
+    output_file = output_file or sys.stdout
+    count = 0
+
+    for line in iter(input_file.readline, ''):
+        path = line.rstrip('\r\n')
+        if not path:
+            continue
+
+        output_file.write(json.dumps(parse_file(path, block_types, stats), ensure_ascii=False))
+        output_file.write('\n')
+        output_file.flush()
+        count += 1
+
+    return count
+
+
+def write_records(records, file):
+    count = 0
+    for record in records:
+        file.write(json.dumps(record, ensure_ascii=False))
+        file.write('\n')
+        count += 1
+
+    return count
+
+
+def write_output(records, output=None):
+    if not output:
+        return write_records(records, sys.stdout)
+
+    with open(output, 'w', encoding='utf-8') as file:
+        return write_records(records, file)
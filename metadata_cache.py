@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import sqlite3
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache',
+                                  'flac_parser', 'metadata.sqlite3')
+COMMIT_EVERY = 1000
+RECORD_VERSION = 2
+
+
+def get_blocks_signature(block_types):
+    if block_types is None:
+        return ''
+
+    return ','.join(str(block_type) for block_type in sorted(block_types))
+
+
+class MetadataCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS files ('
+                                'path TEXT NOT NULL, '
+                                'blocks TEXT NOT NULL, '
+                                'size INTEGER NOT NULL, '
+                                'mtime INTEGER NOT NULL, '
+                                'record TEXT NOT NULL, '
+                                'PRIMARY KEY (path, blocks))')
+        self.connection.execute('CREATE TEMP TABLE IF NOT EXISTS seen ('
+                                'path TEXT PRIMARY KEY)')
+        if self.connection.execute('PRAGMA user_version').fetchone()[0] != RECORD_VERSION:
+            self.connection.execute('DELETE FROM files')
+            self.connection.execute('PRAGMA user_version = {}'.format(RECORD_VERSION))
+            self.connection.commit()
+        self.uncommitted = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.commit()
+        self.connection.close()
+
+    def commit(self):
+        self.connection.commit()
+        self.uncommitted = 0
+
+    def get_key(self, path):
+        stat = os.stat(path)
+        return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+    def get(self, key, block_types=None):
+        path, size, mtime = key
+        row = self.connection.execute('SELECT size, mtime, record FROM files '
+                                      'WHERE path = ? AND blocks = ?',
+                                      (path, get_blocks_signature(block_types))).fetchone()
+        if row is None or row[0] != size or row[1] != mtime:
+            return None
+
+        return json.loads(row[2])
+
+    def put(self, key, record, block_types=None):
+        path, size, mtime = key
+        self.connection.execute('INSERT OR REPLACE INTO files '
+                                '(path, blocks, size, mtime, record) '
+                                'VALUES (?, ?, ?, ?, ?)',
+                                (path, get_blocks_signature(block_types), size,
+                                 mtime, json.dumps(record, ensure_ascii=False)))
+        self.uncommitted += 1
+        if self.uncommitted >= COMMIT_EVERY:
+            self.commit()
+
+    def mark_seen(self, key):
+        self.connection.execute('INSERT OR IGNORE INTO seen (path) VALUES (?)',
+                                (key[0],))
+
+    def prune(self, root):
+        prefix = os.path.join(os.path.abspath(root), '')
+        cursor = self.connection.execute('DELETE FROM files '
+                                         'WHERE substr(path, 1, ?) = ? '
+                                         'AND path NOT IN (SELECT path FROM seen)',
+                                         (len(prefix), prefix))
+        self.connection.execute('DELETE FROM seen')
+        self.commit()
+        return cursor.rowcount
@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import struct
+import tempfile
+from flac_core import BLOCK_TYPES
+from flac_records import VorbisComment
+
+DEFAULT_PADDING = 8192
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_VENDOR = 'flac_parser'
+MAX_BLOCK_LENGTH = (1 << 24) - 1
+
+PADDING = BLOCK_TYPES['PADDING']
+VORBIS_COMMENT = BLOCK_TYPES['VORBIS_COMMENT']
+PICTURE = BLOCK_TYPES['PICTURE']
+
+
+class Slot:
+    __slots__ = ('offset', 'block_type', 'length', 'body', 'is_last', 'was_last', 'is_dirty')
+
+    def __init__(self, offset, block_type, length, body=None, was_last=False):
+        self.offset = offset
+        self.block_type = block_type
+        self.length = length
+        self.body = body
+        self.is_last = was_last
+        self.was_last = was_last
+        self.is_dirty = body is not None
+
+    @property
+    def size(self):
+        return self.length + 4
+
+    def get_header(self):
+        return bytes([(0x80 if self.is_last else 0) | self.block_type]) + \
+            self.length.to_bytes(3, byteorder='big')
+
+
+def make_padding(offset, size):
+    slot = Slot(offset, PADDING, size - 4)
+    slot.is_dirty = True
+    return slot
+
+
+def read_layout(file):
+    file.seek(0)
+    if file.read(4) != b'fLaC':
+        raise ValueError('Given file is not FLAC')
+
+    slots = []
+    is_last = False
+    while not is_last:
+        offset = file.tell()
+        header = file.read(4)
+        if len(header) < 4:
+            raise EOFError('Unexpected end of FLAC stream')
+
+        is_last = bool(header[0] >> 7)
+        length = int.from_bytes(header[1:], byteorder='big')
+        slots.append(Slot(offset, header[0] & 127, length, was_last=is_last))
+        file.seek(length, os.SEEK_CUR)
+
+    return slots, file.tell()
+
+
+def parse_vorbis_comment(data):
+    comment = VorbisComment.from_bytes(data)
+    return comment.vendor, comment.tags
+
+
+def make_vorbis_comment(vendor, tags):
+    vendor = vendor.encode('utf-8')
+    parts = [struct.pack('<I', len(vendor)), vendor, struct.pack('<I', len(tags))]
+    for key, value in tags:
+        tag = '{}={}'.format(key, value).encode('utf-8')
+        parts.append(struct.pack('<I', len(tag)))
+        parts.append(tag)
+
+    return b''.join(parts)
+
+
+def get_image_info(data):
+    if data[:8] == b'\x89PNG\r\n\x1a\n' and data[12:16] == b'IHDR':
+        width, height, bit_depth, color_type = struct.unpack('>IIBB', data[16:26])
+        channels = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}.get(color_type, 1)
+        return 'image/png', width, height, bit_depth * channels
+
+    if data[:2] == b'\xff\xd8':
+        pointer = 2
+        while pointer + 9 < len(data):
+            if data[pointer] != 0xFF:
+                break
+
+            marker = data[pointer + 1]
+            length = int.from_bytes(data[pointer + 2:pointer + 4], byteorder='big')
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                precision, height, width, components = struct.unpack('>BHHB', data[pointer + 4:pointer + 10])
+                return 'image/jpeg', width, height, precision * components
+
+            pointer += 2 + length
+
+        return 'image/jpeg', 0, 0, 0
+
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        width, height = struct.unpack('<HH', data[6:10])
+        return 'image/gif', width, height, 0
+
+    return 'application/octet-stream', 0, 0, 0
+
+
+def make_picture(data, mime_type=None, picture_type=3, description='',
+                 width=None, height=None, color_depth=None, colors_count=0):
+    sniffed_mime, sniffed_width, sniffed_height, sniffed_depth = get_image_info(data)
+    mime_type = (mime_type or sniffed_mime).encode('ascii')
+    description = description.encode('utf-8')
+
+    return b''.join([struct.pack('>II', picture_type, len(mime_type)), mime_type,
+                     struct.pack('>I', len(description)), description,
+                     struct.pack('>IIIII',
+                                 sniffed_width if width is None else width,
+                                 sniffed_height if height is None else height,
+                                 sniffed_depth if color_depth is None else color_depth,
+                                 colors_count, len(data)),
+                     data])
+
+
+def fits(size, need):
+    return size == need or size >= need + 4
+
+
+class MetadataWriter:
+    def __init__(self, path):
+        self.path = path
+        self.vendor = DEFAULT_VENDOR
+        self.tags = []
+        self.tags_changed = False
+        self.vorbis_slot = None
+        self.removed_slots = set()
+        self.new_pictures = []
+
+        with open(path, 'rb') as file:
+            self.slots, self.audio_offset = read_layout(file)
+            self.picture_types = {}
+
+            for slot in self.slots:
+                if slot.block_type == VORBIS_COMMENT and self.vorbis_slot is None:
+                    self.vorbis_slot = slot
+                    file.seek(slot.offset + 4)
+                    self.vendor, self.tags = parse_vorbis_comment(file.read(slot.length))
+
+                if slot.block_type == PICTURE:
+                    file.seek(slot.offset + 4)
+                    self.picture_types[slot] = int.from_bytes(file.read(4), byteorder='big')
+
+    def get_tag(self, key):
+        key = key.upper()
+        return [value for tag_key, value in self.tags if tag_key.upper() == key]
+
+    def set_tag(self, key, values):
+        if isinstance(values, str):
+            values = [values]
+
+        self.remove_tag(key)
+        self.tags.extend((key, value) for value in values)
+        self.tags_changed = True
+
+    def add_tag(self, key, value):
+        self.tags.append((key, value))
+        self.tags_changed = True
+
+    def remove_tag(self, key):
+        key = key.upper()
+        self.tags = [tag for tag in self.tags if tag[0].upper() != key]
+        self.tags_changed = True
+
+    def remove_pictures(self, picture_type=None):
+        for slot in self.picture_types.keys():
+            if picture_type is None or self.picture_types[slot] == picture_type:
+                self.removed_slots.add(slot)
+
+        self.new_pictures = [picture for picture in self.new_pictures
+                             if picture_type is not None and picture[0] != picture_type]
+
+    def add_picture(self, data, mime_type=None, picture_type=3, description='', **kwargs):
+        body = make_picture(data, mime_type, picture_type, description, **kwargs)
+        if len(body) > MAX_BLOCK_LENGTH:
+            raise ValueError('Picture is too large for a metadata block')
+
+        self.new_pictures.append((picture_type, body))
+
+    def replace_picture(self, data, mime_type=None, picture_type=3, description='', **kwargs):
+        self.remove_pictures(picture_type)
+        self.add_picture(data, mime_type, picture_type, description, **kwargs)
+
+    def get_pending_blocks(self):
+        pending = []
+        if self.tags_changed:
+            pending.append((VORBIS_COMMENT, make_vorbis_comment(self.vendor, self.tags)))
+
+        for picture_type, body in self.new_pictures:
+            pending.append((PICTURE, body))
+
+        return pending
+
+    def save(self, padding=DEFAULT_PADDING):
+        pending = self.get_pending_blocks()
+        if not pending and not self.removed_slots:
+            return 'unchanged'
+
+        layout = self.plan_in_place(pending)
+        if layout is not None:
+            self.write_in_place(layout)
+            return 'in place'
+
+        self.rewrite(pending, padding)
+        return 'rewritten'
+
+    def plan_in_place(self, pending):
+        layout = []
+        for slot in self.slots:
+            if slot in self.removed_slots or (slot is self.vorbis_slot and self.tags_changed):
+                layout.append(make_padding(slot.offset, slot.size))
+            else:
+                layout.append(Slot(slot.offset, slot.block_type, slot.length,
+                                   was_last=slot.was_last))
+
+        for block_type, body in pending:
+            need = len(body) + 4
+            for index, slot in enumerate(layout):
+                if slot.block_type != PADDING or not fits(slot.size, need):
+                    continue
+
+                pieces = [Slot(slot.offset, block_type, len(body), body)]
+                if slot.size > need:
+                    pieces.append(make_padding(slot.offset + need, slot.size - need))
+
+                pieces[-1].was_last = slot.was_last
+                layout[index:index + 1] = pieces
+                break
+            else:
+                return None
+
+        merged = []
+        for slot in layout:
+            if merged and slot.block_type == PADDING and merged[-1].block_type == PADDING:
+                merged[-1] = make_padding(merged[-1].offset, merged[-1].size + slot.size)
+                merged[-1].was_last = slot.was_last
+                continue
+
+            merged.append(slot)
+
+        for slot in merged:
+            slot.is_last = slot is merged[-1]
+            if slot.is_last != slot.was_last:
+                slot.is_dirty = True
+
+        return merged
+
+    def write_in_place(self, layout):
+        with open(self.path, 'r+b') as file:
+            for slot in layout:
+                if not slot.is_dirty:
+                    continue
+
+                file.seek(slot.offset)
+                file.write(slot.get_header())
+                if slot.body is not None:
+                    file.write(slot.body)
+                elif slot.block_type == PADDING and slot.length:
+                    write_zeros(file, slot.length)
+
+            file.flush()
+            os.fsync(file.fileno())
+
+    def rewrite(self, pending, padding):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+
+        try:
+            with open(self.path, 'rb') as source, os.fdopen(descriptor, 'wb') as target:
+                target.write(b'fLaC')
+                kept = [slot for slot in self.slots
+                        if slot.block_type != PADDING and slot not in self.removed_slots
+                        and not (slot is self.vorbis_slot and self.tags_changed)]
+
+                for slot in kept:
+                    target.write(Slot(0, slot.block_type, slot.length).get_header())
+                    source.seek(slot.offset + 4)
+                    copy_range(source, target, slot.length)
+
+                for block_type, body in pending:
+                    target.write(Slot(0, block_type, len(body)).get_header())
+                    target.write(body)
+
+                padding_slot = Slot(0, PADDING, padding)
+                padding_slot.is_last = True
+                target.write(padding_slot.get_header())
+                write_zeros(target, padding)
+
+                source.seek(self.audio_offset)
+                shutil.copyfileobj(source, target, CHUNK_SIZE)
+                target.flush()
+                os.fsync(target.fileno())
+
+            shutil.copymode(self.path, temp_path)
+            os.replace(temp_path, self.path)
+
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+
+def copy_range(source, target, length):
+    while length > 0:
+        chunk = source.read(min(length, CHUNK_SIZE))
+        if not chunk:
+            raise EOFError('Unexpected end of FLAC stream')
+        target.write(chunk)
+        length -= len(chunk)
+
+
+def write_zeros(file, length):
+    zeros = bytes(min(length, CHUNK_SIZE))
+    while length > 0:
+        file.write(zeros[:length])
+        length -= len(zeros)
@@ -14,21 +14,122 @@ def text_from_bits_string(bits, encoding='utf-8'):
 
 
 def byte_to_bits(byte, bits_count):
-    return bin(byte)[2:].zfill(bits_count)
+    return format(byte, '0{}b'.format(bits_count))
 
 
 def bits_to_bytes(bit_string):
-    result = bytearray()
-    binary_byte = ''
-    for bit in bit_string:
-        if len(binary_byte) < 8:
-            binary_byte += bit
+    return bytearray(int(bit_string[i:i + 8], base=2)
+                     for i in range(0, len(bit_string), 8))
 
-        else:
-            result.append(int(binary_byte, base=2))
-            binary_byte = bit
-    result.append(int(binary_byte, base=2))
-    return result
+
+def make_crc_table(polynomial, width):
+    top_bit = 1 << (width - 1)
+    mask = (1 << width) - 1
+    table = []
+    for byte in range(256):
+        crc = byte << (width - 8)
+        for _ in range(8):
+            crc = ((crc << 1) ^ polynomial) if crc & top_bit else crc << 1
+        table.append(crc & mask)
+
+    return table
+
+
+CRC8_TABLE = make_crc_table(0x07, 8)
+CRC16_TABLE = make_crc_table(0x8005, 16)
+
+_crc16_shift_tables = None
+
+
+def crc8(data, crc=0):
+    table = CRC8_TABLE
+    for byte in data:
+        crc = table[crc ^ byte]
+
+    return crc
+
+
+def crc16(data, crc=0):
+    table = CRC16_TABLE
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ table[(crc >> 8) ^ byte]
+
+    return crc
+
+
+def iter_crc16_ends(data, start=0):
+    table = CRC16_TABLE
+    crc = crc16(data[:start])
+    for position in range(start, len(data) - 1):
+        if crc == (data[position] << 8) | data[position + 1]:
+            yield position + 2
+
+        crc = ((crc << 8) & 0xFFFF) ^ table[(crc >> 8) ^ data[position]]
+
+
+def get_crc16_shift_tables():
+    global _crc16_shift_tables
+    if _crc16_shift_tables is None:
+        high = [crc16(b'\x00', byte << 8) for byte in range(256)]
+        low = [crc16(b'\x00', byte) for byte in range(256)]
+        _crc16_shift_tables = [(high, low)]
+        for _ in range(47):
+            high = [_crc16_shift_tables[-1][0][crc >> 8] ^ _crc16_shift_tables[-1][1][crc & 0xFF]
+                    for crc in high]
+            low = [_crc16_shift_tables[-1][0][crc >> 8] ^ _crc16_shift_tables[-1][1][crc & 0xFF]
+                   for crc in low]
+            _crc16_shift_tables.append((high, low))
+
+    return _crc16_shift_tables
+
+
+def crc16_shift(crc, length):
+    for high, low in get_crc16_shift_tables():
+        if not length:
+            break
+
+        if length & 1:
+            crc = high[crc >> 8] ^ low[crc & 0xFF]
+        length >>= 1
+
+    return crc
+
+
+def write_utf8_number(value):
+    if value < 0x80:
+        return bytes([value])
+
+    length = 2
+    while value >= 1 << (5 * length + 1):
+        length += 1
+
+    if length > 7:
+        raise ValueError('Number is too large for UTF-8 coding')
+
+    tail = [0x80 | ((value >> (6 * i)) & 0x3F) for i in range(length - 2, -1, -1)]
+    first = ((0xFF00 >> length) & 0xFF) | (value >> (6 * (length - 1)))
+    return bytes([first] + tail)
+
+
+def read_utf8_number(data, position):
+    first_byte = data[position]
+    if first_byte < 0x80:
+        return first_byte, 1
+
+    length = 8 - (first_byte ^ 0xFF).bit_length()
+    if length < 2 or length > 7:
+        raise ValueError('Invalid UTF-8 coded number')
+
+    value = first_byte & (0x7F >> length)
+    for byte in data[position + 1:position + length]:
+        if byte & 0xC0 != 0x80:
+            raise ValueError('Invalid UTF-8 coded number')
+        value = (value << 6) | (byte & 0x3F)
+
+    if position + length > len(data):
+        raise EOFError('Not enough bytes in buffer')
+
+    return value, length
 
 
 def get_check_sum(bytes):
@@ -39,3 +140,75 @@ def get_check_sum(bytes):
         counter += 1
 
     return check_sum
+
+
+class BitReader:
+    def __init__(self, data, position=0):
+        self.data = data
+        self.position = position
+        self.length = len(data) * 8
+
+    @property
+    def byte_position(self):
+        return self.position >> 3
+
+    def bits_left(self):
+        return self.length - self.position
+
+    def read_bits(self, count):
+        if count == 0:
+            return 0
+
+        end_of_range = self.position + count
+        if end_of_range > self.length:
+            raise EOFError('Not enough bits in buffer')
+
+        start = self.position >> 3
+        end = (end_of_range + 7) >> 3
+        value = int.from_bytes(self.data[start:end], byteorder='big')
+        value >>= (end << 3) - end_of_range
+        self.position = end_of_range
+
+        return value & ((1 << count) - 1)
+
+    def read_signed(self, count):
+        value = self.read_bits(count)
+        if count and value >> (count - 1):
+            value -= 1 << count
+
+        return value
+
+    def read_unary(self):
+        byte_index = self.position >> 3
+        if byte_index >= len(self.data):
+            raise EOFError('Not enough bits in buffer')
+
+        byte = self.data[byte_index] & (0xFF >> (self.position & 7))
+        while not byte:
+            byte_index += 1
+            if byte_index >= len(self.data):
+                raise EOFError('Not enough bits in buffer')
+            byte = self.data[byte_index]
+
+        end_of_zeros = (byte_index << 3) + 8 - byte.bit_length()
+        zeros = end_of_zeros - self.position
+        self.position = end_of_zeros + 1
+
+        return zeros
+
+    def read_bytes(self, count):
+        if self.position & 7:
+            raise ValueError('Reader is not byte aligned')
+
+        start = self.position >> 3
+        if start + count > len(self.data):
+            raise EOFError('Not enough bits in buffer')
+
+        self.position += count << 3
+        return self.data[start:start + count]
+
+    def skip_bits(self, count):
+        self.position += count
+
+    def align(self):
+        self.position = (self.position + 7) & ~7
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+
+
+def get_workers_count(workers=None):
+    return workers or os.cpu_count() or 1
+
+
+def iter_batches(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+class BoundedPool:
+    def __init__(self, function, workers=None, max_pending=None, context=None):
+        self.function = function
+        self.workers = get_workers_count(workers)
+        self.max_pending = max_pending or self.workers * 2
+        self.executor = None
+        self.pending = set()
+
+        if self.workers > 1:
+            from concurrent.futures import ProcessPoolExecutor
+
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=context)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+
+    def submit(self, item):
+        if self.executor is None:
+            return [self.function(item)]
+
+        from concurrent.futures import FIRST_COMPLETED, wait
+
+        self.pending.add(self.executor.submit(self.function, item))
+        if len(self.pending) < self.max_pending:
+            return []
+
+        done, self.pending = wait(self.pending, return_when=FIRST_COMPLETED)
+        return [future.result() for future in done]
+
+    def drain(self):
+        from concurrent.futures import FIRST_COMPLETED, wait
+
+        while self.pending:
+            done, self.pending = wait(self.pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def map_unordered(function, items, workers=None, max_pending=None, context=None):
+    with BoundedPool(function, workers, max_pending, context) as pool:
+        for item in items:
+            yield from pool.submit(item)
+
+        yield from pool.drain()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import functools
+import os
+import queue
+import struct
+import sys
+import tempfile
+import threading
+import frame_scanner
+import operations_with_processes as owp
+from flac_decoder import decode_frame
+from flac_verifier import get_sample_bytes
+
+QUEUE_SIZE = 16
+WRITE_BUFFER = 1024 * 1024
+POLL_INTERVAL = 0.1
+FORMATS = {'wav': '.wav', 'raw': '.pcm'}
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+KSDATAFORMAT_SUBTYPE_PCM = bytes.fromhex('0100000000001000800000aa00389b71')
+CHANNEL_MASKS = {1: 0x4, 2: 0x3, 3: 0x7, 4: 0x33, 5: 0x37, 6: 0x3F, 7: 0x70F, 8: 0x63F}
+MAX_CHUNK_SIZE = 0xFFFFFFFF
+
+DONE = object()
+
+
+def get_container_bits(bits_per_sample):
+    return (bits_per_sample + 7) // 8 * 8
+
+
+def make_wav_header(stream, total_samples):
+    container_bits = get_container_bits(stream.bits_per_sample)
+    block_align = stream.channels * container_bits // 8
+    byte_rate = stream.sample_rate * block_align
+    data_size = MAX_CHUNK_SIZE if total_samples is None else total_samples * block_align
+
+    if stream.channels > 2 or container_bits > 16 or container_bits != stream.bits_per_sample:
+        fmt = struct.pack('<HHIIHHHHI16s', WAVE_FORMAT_EXTENSIBLE, stream.channels,
+                          stream.sample_rate, byte_rate, block_align, container_bits, 22,
+                          stream.bits_per_sample, CHANNEL_MASKS.get(stream.channels, 0),
+                          KSDATAFORMAT_SUBTYPE_PCM)
+    else:
+        fmt = struct.pack('<HHIIHH', WAVE_FORMAT_PCM, stream.channels, stream.sample_rate,
+                          byte_rate, block_align, container_bits)
+
+    riff_size = 4 + 8 + len(fmt) + 8 + data_size + data_size % 2
+    return b''.join([b'RIFF', struct.pack('<I', min(riff_size, MAX_CHUNK_SIZE)), b'WAVE',
+                     b'fmt ', struct.pack('<I', len(fmt)), fmt,
+                     b'data', struct.pack('<I', min(data_size, MAX_CHUNK_SIZE))])
+
+
+def get_wav_bytes(samples, bits_per_sample):
+    container_bits = get_container_bits(bits_per_sample)
+    if container_bits == 8:
+        return (samples + 128).astype('u1').tobytes()
+
+    if container_bits != bits_per_sample:
+        samples = samples << (container_bits - bits_per_sample)
+
+    return get_sample_bytes(samples, container_bits)
+
+
+def put(target, item, stop):
+    while not stop.is_set():
+        try:
+            target.put(item, timeout=POLL_INTERVAL)
+            return True
+        except queue.Full:
+            pass
+
+    return False
+
+
+def get(source, stop):
+    while not stop.is_set():
+        try:
+            return source.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            pass
+
+    return DONE
+
+
+class ExportPipeline:
+    def __init__(self, path, file, output_format='wav', queue_size=QUEUE_SIZE,
+                 chunk_size=frame_scanner.CHUNK_SIZE):
+        if output_format not in FORMATS:
+            raise ValueError('Unknown output format {}'.format(output_format))
+
+        self.path = path
+        self.file = file
+        self.output_format = output_format
+        self.chunk_size = chunk_size
+        self.stream, self.audio_offset = frame_scanner.read_stream(path)
+        self.frames = queue.Queue(queue_size)
+        self.chunks = queue.Queue(queue_size)
+        self.stop = threading.Event()
+        self.errors = []
+        self.samples = 0
+        self.bytes = 0
+
+    def read(self):
+        try:
+            with open(self.path, 'rb') as file:
+                scanner = frame_scanner.FrameScanner(file, self.audio_offset, self.stream,
+                                                     self.chunk_size, True)
+                for item in scanner:
+                    if not put(self.frames, item, self.stop):
+                        return
+
+        except BaseException as error:
+            self.errors.append(error)
+
+        put(self.frames, DONE, self.stop)
+
+    def write(self):
+        try:
+            while True:
+                data = get(self.chunks, self.stop)
+                if data is DONE:
+                    return
+
+                self.file.write(data)
+                self.bytes += len(data)
+
+        except BaseException as error:
+            self.errors.append(error)
+            self.stop.set()
+
+    def decode(self):
+        bits_per_sample = self.stream.bits_per_sample
+        while True:
+            item = get(self.frames, self.stop)
+            if item is DONE:
+                break
+
+            samples = decode_frame(*item)
+            self.samples += len(samples)
+            if self.output_format == 'wav':
+                data = get_wav_bytes(samples, bits_per_sample)
+            else:
+                data = get_sample_bytes(samples, bits_per_sample)
+
+            if not put(self.chunks, data, self.stop):
+                break
+
+        put(self.chunks, DONE, self.stop)
+
+    def run(self):
+        if self.output_format == 'wav':
+            header = make_wav_header(self.stream, self.stream.total_samples or None)
+            self.file.write(header)
+            self.bytes += len(header)
+
+        reader = threading.Thread(target=self.read, daemon=True)
+        writer = threading.Thread(target=self.write, daemon=True)
+        reader.start()
+        writer.start()
+
+        try:
+            self.decode()
+        except BaseException:
+            self.stop.set()
+            raise
+        finally:
+            writer.join()
+            self.stop.set()
+            reader.join()
+
+        if self.errors:
+            raise self.errors[0]
+
+        if self.output_format == 'wav':
+            self.finish_wav()
+
+        return self.samples
+
+    def finish_wav(self):
+        block_align = self.stream.channels * get_container_bits(self.stream.bits_per_sample) // 8
+        if (self.samples * block_align) % 2:
+            self.file.write(b'\x00')
+            self.bytes += 1
+
+        if self.samples == self.stream.total_samples:
+            return
+
+        if not (hasattr(self.file, 'seekable') and self.file.seekable()):
+            if not self.stream.total_samples:
+                return
+
+            raise ValueError('Decoded {} samples, STREAMINFO declares {}'
+                             .format(self.samples, self.stream.total_samples))
+
+        self.file.seek(0)
+        self.file.write(make_wav_header(self.stream, self.samples))
+        self.file.seek(0, os.SEEK_END)
+
+
+def get_output_path(path, output_format='wav'):
+    return os.path.splitext(path)[0] + FORMATS[output_format]
+
+
+def export_file(path, output=None, output_format='wav'):
+    if output is None:
+        output = get_output_path(path, output_format)
+
+    if output == '-':
+        pipeline = ExportPipeline(path, sys.stdout.buffer, output_format)
+        pipeline.run()
+        sys.stdout.buffer.flush()
+        return {'path': path, 'output': output, 'samples': pipeline.samples,
+                'bytes': pipeline.bytes}
+
+    directory = os.path.dirname(os.path.abspath(output))
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+
+    try:
+        with os.fdopen(descriptor, 'wb', buffering=WRITE_BUFFER) as file:
+            pipeline = ExportPipeline(path, file, output_format)
+            pipeline.run()
+
+        os.replace(temp_path, output)
+
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return {'path': path, 'output': output, 'samples': pipeline.samples,
+            'bytes': pipeline.bytes}
+
+
+def export_task(task, output_format='wav'):
+    path, output = task
+    try:
+        return export_file(path, output, output_format)
+    except Exception as error:
+        return {'path': path, 'error': '{}: {}'.format(type(error).__name__, error)}
+
+
+def iter_tasks(paths, root=None, directory=None, output_format='wav'):
+    for path in paths:
+        if directory is None:
+            yield path, None
+            continue
+
+        name = os.path.relpath(path, root) if root else os.path.basename(path)
+        yield path, os.path.join(directory, get_output_path(name, output_format))
+
+
+def export(paths, root=None, directory=None, output_format='wav', workers=None):
+    function = functools.partial(export_task, output_format=output_format)
+    return owp.map_unordered(function, iter_tasks(paths, root, directory, output_format),
+                             workers)
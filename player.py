@@ -1,17 +1,21 @@
 # PyQt5 Video player
 # !/usr/bin/env python
 
-from PyQt5.QtCore import QDir, Qt, QUrl
+from PyQt5.QtCore import QDir, Qt, QThreadPool, QUrl
 from PyQt5.QtMultimedia import QMediaContent, QMediaPlayer
-from PyQt5.QtMultimediaWidgets import QVideoWidget
 from PyQt5.QtWidgets import (QApplication, QFileDialog, QHBoxLayout, QLabel, QMessageBox,
         QPushButton, QSizePolicy, QSlider, QStyle, QVBoxLayout, QWidget, QLayout, QTextEdit)
 from PyQt5.QtWidgets import QMainWindow, QWidget, QPushButton, QAction, QTableWidget, QTableWidgetItem
 from PyQt5.QtGui import QIcon, QPixmap
 import sys
 import os
-import operations_with_os as owo
-from flac_parser import Parser
+from player_workers import ParseSignals, ParseTask, PeaksTask, PrefetchTask
+from playlist import PREFETCH_BYTES, PREFETCH_COUNT, Playlist, PrefetchCache
+from thumbnail_cache import DEFAULT_DIRECTORY, ThumbnailCache
+from waveform_slider import WaveformSlider
+
+PICTURE_SIZE = 512
+PEAKS_WORKERS = max(1, (os.cpu_count() or 1) // 2)
 
 
 class AudioWindow(QMainWindow):
@@ -21,11 +25,23 @@ class AudioWindow(QMainWindow):
         self.setWindowTitle("Audioplayer")
 
         self.media_player = QMediaPlayer()
+        self.thread_pool = QThreadPool()
+        self.peaks_pool = QThreadPool()
+        self.peaks_pool.setMaxThreadCount(1)
+        self.generation = 0
+        self.parse_signals = ParseSignals(self)
+        self.thumbnails = ThumbnailCache(PICTURE_SIZE, PICTURE_SIZE,
+                                         directory=DEFAULT_DIRECTORY)
+        self.default_pic = None
+        self.playlist = Playlist()
+        self.prefetched = PrefetchCache(PREFETCH_COUNT + 1, PREFETCH_BYTES)
+        self.prefetching = set()
 
         self.wid = QWidget(self)
         self.setCentralWidget(self.wid)
 
         self.tables = {}
+        self.info = {}
         self.name = ''
         self.file_opened = False
         self.picture_exist = False
@@ -40,7 +56,10 @@ class AudioWindow(QMainWindow):
         self.wid.setLayout(self.main_layout)
 
     def _init_menu_bar(self):
-        decomposition_dict = {'&Open': ('Ctrl+O', 'Open song', self.open_file),
+        decomposition_dict = {'&Open': ('Ctrl+O', 'Open songs', self.open_file),
+                              '&Queue': ('Ctrl+Shift+O', 'Add songs to the queue', self.queue_files),
+                              '&Next': ('Ctrl+Right', 'Next song', self.next_track),
+                              '&Previous': ('Ctrl+Left', 'Previous song', self.previous_track),
                               '&Exit': ('Ctrl+Q', 'Exit application', self.exit_call),
                               '&Save': ('Ctrl+S', 'Save picture', self.save_picture)}
 
@@ -82,7 +101,7 @@ class AudioWindow(QMainWindow):
         self.playButton.setShortcut('Space')
         self.playButton.clicked.connect(self.play)
 
-        self.positionSlider = QSlider(Qt.Horizontal)
+        self.positionSlider = WaveformSlider()
         self.positionSlider.setRange(0, 0)
         self.positionSlider.sliderMoved.connect(self.media_player.setPosition)
 
@@ -122,18 +141,79 @@ class AudioWindow(QMainWindow):
         self.media_player.volumeChanged.connect(self.volume_changed)
         self.media_player.durationChanged.connect(self.duration_changed)
         self.media_player.error.connect(self.handle_error)
+        self.parse_signals.finished.connect(self.parsed)
+        self.parse_signals.failed.connect(self.parse_failed)
+        self.parse_signals.peaks_ready.connect(self.peaks_ready)
+        self.parse_signals.prefetched.connect(self.store_prefetched)
+        self.media_player.mediaStatusChanged.connect(self.media_status_changed)
 
     def open_file(self):
-        file_name, _ = QFileDialog.getOpenFileName(self, "Open song",
-                                                   QDir.homePath())
-
-        if file_name != '':
-            self.file_opened = True
-            self.name = file_name
-            self.media_player.setMedia(
-                    QMediaContent(QUrl.fromLocalFile(file_name)))
-            self.playButton.setEnabled(True)
+        file_names, _ = QFileDialog.getOpenFileNames(self, "Open songs",
+                                                     QDir.homePath())
+
+        if file_names:
+            self.playlist.clear()
+            self.playlist.add(file_names)
+            self.load_track(self.playlist.next())
+
+    def queue_files(self):
+        file_names, _ = QFileDialog.getOpenFileNames(self, "Add songs to the queue",
+                                                     QDir.homePath())
+
+        if file_names:
+            self.playlist.add(file_names)
+            if self.playlist.current is None:
+                self.load_track(self.playlist.next())
+            else:
+                self.prefetch()
+
+    def next_track(self):
+        file_name = self.playlist.next()
+        if file_name is not None:
+            self.load_track(file_name, True)
+
+    def previous_track(self):
+        file_name = self.playlist.previous()
+        if file_name is not None:
+            self.load_track(file_name, True)
+
+    def load_track(self, file_name, autoplay=False):
+        self.file_opened = True
+        self.name = file_name
+        self.media_player.setMedia(
+                QMediaContent(QUrl.fromLocalFile(file_name)))
+        self.playButton.setEnabled(True)
+        if autoplay:
+            self.media_player.play()
+
+        prepared = self.prefetched.get(file_name)
+        if prepared is None:
             self.try_parse(file_name)
+        else:
+            self.generation += 1
+            self.show_track(self.generation, prepared)
+
+        self.prefetch()
+
+    def prefetch(self):
+        upcoming = self.playlist.get_upcoming(PREFETCH_COUNT)
+        self.prefetched.retain(upcoming + [self.playlist.current])
+
+        for file_name in upcoming:
+            if file_name in self.prefetched or file_name in self.prefetching:
+                continue
+
+            self.prefetching.add(file_name)
+            self.thread_pool.start(PrefetchTask(file_name, self.parse_signals, self.thumbnails))
+
+    def store_prefetched(self, file_name, prepared):
+        self.prefetching.discard(file_name)
+        if prepared is not None and file_name in self.playlist.get_upcoming(PREFETCH_COUNT):
+            self.prefetched.put(file_name, prepared, prepared.get_cost())
+
+    def media_status_changed(self, status):
+        if status == QMediaPlayer.EndOfMedia:
+            self.next_track()
 
     def save_picture(self):
         if self.picture_exist:
@@ -141,7 +221,7 @@ class AudioWindow(QMainWindow):
                                                     QDir.homePath(), '(*.{})'
                                                     .format(self.extension))[0]
             if file_name != '':
-                owo.write_bytes_to_file(self.pic_bytes, file_name)
+                self.picture.save_to(file_name)
 
         else:
             QMessageBox.question(self, 'Error',
@@ -152,7 +232,10 @@ class AudioWindow(QMainWindow):
         sys.exit(app.exec_())
 
     def show_info(self, info_part):
-        if info_part in self.tables.keys():
+        if info_part in self.info.keys():
+            if info_part not in self.tables.keys():
+                self.tables[info_part] = self.make_table(info_part, self.info[info_part])
+
             self.make_info_wid(self.tables[info_part])
             self.info_wid.setWindowTitle(info_part)
             self.info_wid.show()
@@ -163,46 +246,75 @@ class AudioWindow(QMainWindow):
                                  .format(info_part), QMessageBox.Ok)
 
     def try_parse(self, file_name):
-        file_bytes = owo.read_bytes_from_file(file_name)
-        if file_bytes[:4] == b'fLaC':
-            parser = Parser(file_bytes[4:], False)
-            parser.parse_flac()
-            self.fill_tables(parser.result_dict)
-            self.set_name(self.name)
-
-            if parser.picture_exist:
-                self.picture_exist = True
-                self.extension = parser.extension
-                self.pic_bytes = parser.pic_bytes
-                self.set_pic(self.pic_bytes)
-            else:
-                self.picture_exist = False
-                self.set_default_pic()
-
+        self.generation += 1
+        self.thread_pool.clear()
+        self.prefetching.clear()
+
+        self.thread_pool.start(ParseTask(self.generation, file_name,
+                                         self.parse_signals, self.thumbnails,
+                                         self.is_current), 1)
+
+    def is_current(self, generation):
+        return generation == self.generation
+
+    def parsed(self, generation, prepared):
+        if not self.is_current(generation):
+            return
+
+        self.prefetched.put(prepared.path, prepared, prepared.get_cost())
+        self.show_track(generation, prepared)
+
+    def show_track(self, generation, prepared):
+        self.fill_tables(prepared.rows)
+        self.set_name(self.name)
+        self.positionSlider.set_peaks(None)
+        if 'Stream info' in prepared.result:
+            self.peaks_pool.clear()
+            self.peaks_pool.start(PeaksTask(generation, prepared.path,
+                                            prepared.result['Stream info']['MD5 signature'],
+                                            self.parse_signals, self.is_current, PEAKS_WORKERS))
+
+        if prepared.picture is not None:
+            self.picture_exist = True
+            self.picture = prepared.picture
+            self.extension = self.picture.extension
+            self.set_pic(prepared.image)
         else:
-            QMessageBox.question(self, 'Error',
-                                 'Given file is not FLAC',
-                                 QMessageBox.Ok)
+            self.picture_exist = False
+            self.set_default_pic()
 
-    def fill_tables(self, dict):
+    def peaks_ready(self, generation, peaks):
+        if self.is_current(generation):
+            self.positionSlider.set_peaks(peaks)
+
+    def parse_failed(self, generation, error):
+        if not self.is_current(generation):
+            return
+
+        QMessageBox.question(self, 'Error',
+                             error,
+                             QMessageBox.Ok)
+
+    def fill_tables(self, rows):
         self.tables.clear()
+        self.info = rows
 
-        for key in dict.keys():
-            table = QTableWidget()
-            table.setColumnCount(2)
-            table.setRowCount(len(dict[key].keys()))
+    def make_table(self, key, rows):
+        table = QTableWidget()
+        table.setColumnCount(2)
+        table.setRowCount(len(rows))
 
-            table.setHorizontalHeaderLabels([key, 'Value'])
+        table.setHorizontalHeaderLabels([key, 'Value'])
 
-            pointer = 0
-            for value_key in dict[key].keys():
-                table.setItem(pointer, 0, QTableWidgetItem(value_key))
-                table.setItem(pointer, 1, QTableWidgetItem(str(dict[key][value_key])))
+        pointer = 0
+        for value_key, value in rows:
+            table.setItem(pointer, 0, QTableWidgetItem(value_key))
+            table.setItem(pointer, 1, QTableWidgetItem(value))
 
-                pointer += 1
+            pointer += 1
 
-            table.resizeColumnsToContents()
-            self.tables[key] = table
+        table.resizeColumnsToContents()
+        return table
 
     def make_info_wid(self, table):
         self.info_wid = table
@@ -224,13 +336,19 @@ class AudioWindow(QMainWindow):
         self.pic_wid.addStretch(1)
 
     def set_default_pic(self):
-        pic = QPixmap('il.png')
+        if self.default_pic is None:
+            self.default_pic = QPixmap('il.png')
+
+        pic = self.default_pic
         self.pic_label.setPixmap(pic)
         self.pic_label.resize(pic.width(), pic.height())
 
-    def set_pic(self, bytes):
-        pic = QPixmap()
-        pic.loadFromData(bytes)
+    def set_pic(self, image):
+        if image is None:
+            self.set_default_pic()
+            return
+
+        pic = QPixmap.fromImage(image)
         self.pic_label.setPixmap(pic)
         self.pic_label.resize(pic.width(), pic.height())
 
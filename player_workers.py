@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+import library_scanner
+from flac_records import Picture
+from metadata_cache import DEFAULT_CACHE_PATH, MetadataCache
+from thumbnail_cache import get_image_cost
+
+
+def load_record(file_name, cache_path=DEFAULT_CACHE_PATH):
+    with MetadataCache(cache_path) as cache:
+        key = cache.get_key(file_name)
+        record = cache.get(key)
+        if record is None:
+            record = library_scanner.parse_file(file_name)
+            if library_scanner.is_cacheable(record):
+                cache.put(key, record)
+
+    return record
+
+
+def load_picture(file_name, result, thumbnails):
+    if 'Picture info' not in result:
+        return None, None
+
+    picture = Picture.from_dict(result['Picture info'], file_name)
+    return picture, thumbnails.get_thumbnail(bytes(picture.read()))
+
+
+def get_table_rows(result):
+    return {section: [(str(key), str(value)) for key, value in values.items()]
+            for section, values in result.items() if isinstance(values, dict)}
+
+
+class PreparedTrack:
+    __slots__ = ('path', 'result', 'picture', 'image', 'rows')
+
+    def __init__(self, path, result, picture, image, rows):
+        self.path = path
+        self.result = result
+        self.picture = picture
+        self.image = image
+        self.rows = rows
+
+    def get_cost(self):
+        cost = sum(len(key) + len(value) for rows in self.rows.values() for key, value in rows)
+        if self.image is not None:
+            cost += get_image_cost(self.image)
+
+        return cost
+
+
+def prepare_track(file_name, result, thumbnails):
+    picture, image = load_picture(file_name, result, thumbnails)
+    return PreparedTrack(file_name, result, picture, image, get_table_rows(result))
+
+
+class ParseSignals(QObject):
+    finished = pyqtSignal(int, object)
+    failed = pyqtSignal(int, str)
+    peaks_ready = pyqtSignal(int, object)
+    prefetched = pyqtSignal(str, object)
+
+
+class ParseTask(QRunnable):
+    def __init__(self, generation, file_name, signals, thumbnails, is_current,
+                 cache_path=DEFAULT_CACHE_PATH):
+        super(ParseTask, self).__init__()
+        self.generation = generation
+        self.file_name = file_name
+        self.signals = signals
+        self.thumbnails = thumbnails
+        self.is_current = is_current
+        self.cache_path = cache_path
+
+    def run(self):
+        try:
+            if not self.is_current(self.generation):
+                return
+
+            record = load_record(self.file_name, self.cache_path)
+            if not self.is_current(self.generation):
+                return
+
+            if 'result' not in record:
+                self.signals.failed.emit(self.generation, record['error'])
+                return
+
+            prepared = prepare_track(self.file_name, record['result'], self.thumbnails)
+            if self.is_current(self.generation):
+                self.signals.finished.emit(self.generation, prepared)
+
+        except Exception as error:
+            self.signals.failed.emit(self.generation, '{}: {}'.format(type(error).__name__, error))
+
+
+class PrefetchTask(QRunnable):
+    def __init__(self, file_name, signals, thumbnails, cache_path=DEFAULT_CACHE_PATH):
+        super(PrefetchTask, self).__init__()
+        self.file_name = file_name
+        self.signals = signals
+        self.thumbnails = thumbnails
+        self.cache_path = cache_path
+
+    def run(self):
+        prepared = None
+        try:
+            record = load_record(self.file_name, self.cache_path)
+            if 'result' in record:
+                prepared = prepare_track(self.file_name, record['result'], self.thumbnails)
+        except Exception:
+            pass
+
+        self.signals.prefetched.emit(self.file_name, prepared)
+
+
+class PeaksTask(QRunnable):
+    def __init__(self, generation, file_name, md5, signals, is_current, workers=1):
+        super(PeaksTask, self).__init__()
+        self.generation = generation
+        self.file_name = file_name
+        self.md5 = md5
+        self.signals = signals
+        self.is_current = is_current
+        self.workers = workers
+
+    def run(self):
+        try:
+            import waveform
+        except ImportError:
+            return
+
+        if not self.is_current(self.generation):
+            return
+
+        try:
+            peaks = waveform.get_peaks(self.file_name, self.md5, workers=self.workers,
+                                       context=multiprocessing.get_context('spawn'))
+        except Exception:
+            return
+
+        if self.is_current(self.generation):
+            self.signals.peaks_ready.emit(self.generation, peaks)
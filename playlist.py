@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+
+PREFETCH_COUNT = 3
+PREFETCH_BYTES = 32 * 1024 * 1024
+
+
+class Playlist:
+    def __init__(self, paths=None):
+        self.paths = list(paths or [])
+        self.position = -1
+
+    def __len__(self):
+        return len(self.paths)
+
+    def add(self, paths):
+        self.paths.extend(paths)
+
+    def clear(self):
+        self.paths = []
+        self.position = -1
+
+    @property
+    def current(self):
+        if 0 <= self.position < len(self.paths):
+            return self.paths[self.position]
+
+        return None
+
+    def set_position(self, position):
+        if not 0 <= position < len(self.paths):
+            return None
+
+        self.position = position
+        return self.current
+
+    def next(self):
+        return self.set_position(self.position + 1)
+
+    def previous(self):
+        return self.set_position(self.position - 1)
+
+    def get_upcoming(self, count=PREFETCH_COUNT):
+        return self.paths[self.position + 1:self.position + 1 + count]
+
+
+class PrefetchCache:
+    def __init__(self, max_items=PREFETCH_COUNT + 1, max_bytes=PREFETCH_BYTES):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.items = OrderedDict()
+        self.size = 0
+
+    def __contains__(self, path):
+        return path in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, path):
+        if path not in self.items:
+            return None
+
+        self.items.move_to_end(path)
+        return self.items[path][0]
+
+    def put(self, path, item, cost):
+        self.discard(path)
+        if cost > self.max_bytes:
+            return
+
+        self.items[path] = (item, cost)
+        self.size += cost
+        while len(self.items) > self.max_items or self.size > self.max_bytes:
+            _, (_, evicted_cost) = self.items.popitem(last=False)
+            self.size -= evicted_cost
+
+    def discard(self, path):
+        if path in self.items:
+            self.size -= self.items.pop(path)[1]
+
+    def retain(self, paths):
+        paths = set(paths)
+        for path in [path for path in self.items.keys() if path not in paths]:
+            self.discard(path)
@@ -0,0 +1,135 @@
+import random
+import numpy as np
+import pytest
+import soundfile
+import flac_generator
+import frame_scanner
+from flac_decoder import Decoder, decode_frame
+from flac_generator import (BLOCK_SIZE, CHANNELS, LEFT_SIDE, MID_SIDE, RIGHT_SIDE,
+                            get_bits, get_stereo_channels, make_fixed_subframe, make_frame,
+                            make_residual, make_subframe_header, make_verbatim_subframe)
+from flac_records import StreamInfo
+
+STREAM = StreamInfo(BLOCK_SIZE, BLOCK_SIZE, 0, 0, 44100, CHANNELS, 16, 0, 0)
+SUBFRAME_LPC = 0x20
+
+
+def make_signal(seed, samples_count=BLOCK_SIZE):
+    return flac_generator.make_signal(samples_count, random.Random(seed))
+
+
+def decode(subframes, samples_count=BLOCK_SIZE, channel_assignment=CHANNELS - 1):
+    data = make_frame(0, samples_count, subframes, channel_assignment)
+    header = frame_scanner.parse_frame_header(data, 0, STREAM)
+    assert header is not None
+    return decode_frame(header, data)
+
+
+def predict_lpc(samples, coefficients, shift):
+    order = len(coefficients)
+    prediction = np.zeros(len(samples) - order, dtype=np.int64)
+    for lag, coefficient in enumerate(coefficients, 1):
+        prediction += coefficient * samples[order - lag:len(samples) - lag]
+
+    return prediction >> shift
+
+
+def make_lpc_subframe(samples, coefficients, precision, shift, bits_per_sample,
+                      partition_order=0, escape=False):
+    order = len(coefficients)
+    residual = samples[order:] - predict_lpc(samples, coefficients, shift)
+    return np.concatenate((make_subframe_header(SUBFRAME_LPC | (order - 1)),
+                           get_bits(samples[:order], bits_per_sample),
+                           get_bits(precision - 1, 4), get_bits(shift, 5),
+                           get_bits(coefficients, precision),
+                           make_residual(residual, order, len(samples), partition_order, escape)))
+
+
+@pytest.mark.parametrize('order', range(5))
+@pytest.mark.parametrize('partition_order', [0, 3])
+def test_fixed(order, partition_order):
+    left, right = make_signal(order), make_signal(order + 10)
+    samples = decode([make_fixed_subframe(left, order, 16, partition_order),
+                      make_fixed_subframe(right, order, 16, partition_order)])
+
+    assert np.array_equal(samples, np.stack((left, right), axis=1))
+
+
+def test_fixed_with_five_bit_rice_parameters():
+    noise = np.random.default_rng(0).integers(-32768, 32768, BLOCK_SIZE)
+    samples = decode([make_fixed_subframe(noise, 0, 16), make_fixed_subframe(-noise - 1, 1, 16)])
+
+    assert np.array_equal(samples, np.stack((noise, -noise - 1), axis=1))
+
+
+@pytest.mark.parametrize('coefficients, precision, shift', [
+    ([1], 2, 0),
+    ([1853, -830], 12, 10),
+    ([1200, -350, 120, -40, 20, -8, 4, -1], 13, 10),
+    ([(-1) ** lag * (32 >> min(lag, 5)) for lag in range(32)], 15, 6),
+])
+def test_lpc(coefficients, precision, shift):
+    left, right = make_signal(1), make_signal(2)
+    samples = decode([make_lpc_subframe(left, coefficients, precision, shift, 16, 2),
+                      make_lpc_subframe(right, coefficients, precision, shift, 16)])
+
+    assert np.array_equal(samples, np.stack((left, right), axis=1))
+
+
+def test_escaped_partitions():
+    left = make_signal(3)
+    ramp = np.arange(BLOCK_SIZE, dtype=np.int64) * 3 - 6000
+    samples = decode([make_lpc_subframe(left, [1853, -830], 12, 10, 16, 2, escape=True),
+                      make_fixed_subframe(ramp, 2, 16, 1, escape=True)])
+
+    assert np.array_equal(samples, np.stack((left, ramp), axis=1))
+
+
+@pytest.mark.parametrize('wasted_bits', [1, 3, 8])
+def test_wasted_bits(wasted_bits):
+    left = make_signal(5) >> wasted_bits << wasted_bits
+    right = np.full(BLOCK_SIZE, -1 << wasted_bits, dtype=np.int64)
+    samples = decode([make_fixed_subframe(left, 2, 16, 2, wasted_bits),
+                      make_fixed_subframe(right, 1, 16, 0, wasted_bits)])
+
+    assert np.array_equal(samples, np.stack((left, right), axis=1))
+
+
+@pytest.mark.parametrize('channel_assignment', [LEFT_SIDE, RIGHT_SIDE, MID_SIDE])
+def test_stereo_decorrelation(channel_assignment):
+    left = make_signal(6)
+    right = -left - 1
+    left[:4] = [-32768, 32767, -32768, 32767]
+    right[:4] = [32767, -32768, -32768, 32767]
+    subframes = [make_fixed_subframe(channel, 2, bits_per_sample, 1)
+                 for channel, bits_per_sample
+                 in get_stereo_channels(left, right, channel_assignment)]
+    samples = decode(subframes, channel_assignment=channel_assignment)
+
+    assert np.array_equal(samples, np.stack((left, right), axis=1))
+
+
+def test_verbatim_short_block():
+    left, right = make_signal(7, 100), make_signal(8, 100)
+    samples = decode([make_verbatim_subframe(left, 16), make_verbatim_subframe(right, 16)], 100)
+
+    assert np.array_equal(samples, np.stack((left, right), axis=1))
+
+
+@pytest.mark.parametrize('bits_per_sample, wasted_bits', [(16, 0), (16, 4), (24, 8)])
+def test_libflac_reference(tmp_path, bits_per_sample, wasted_bits):
+    generator = random.Random(9)
+    length = 5 * BLOCK_SIZE + 123
+    left = flac_generator.make_signal(length, generator)
+    right = (left * 3) // 4 + flac_generator.make_signal(length, generator) // 8
+    pcm = np.stack((left, right), axis=1) << (bits_per_sample - 16)
+    pcm = pcm >> wasted_bits << wasted_bits
+
+    path = str(tmp_path / 'reference.flac')
+    soundfile.write(path, pcm.astype(np.int32) << (32 - bits_per_sample), 44100,
+                    subtype='PCM_{}'.format(bits_per_sample), format='FLAC')
+    reference, _ = soundfile.read(path, dtype='int32')
+    decoded = np.concatenate(list(Decoder(path)))
+
+    assert np.array_equal(reference >> (32 - bits_per_sample), pcm)
+    assert np.array_equal(decoded, pcm)
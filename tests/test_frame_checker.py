@@ -0,0 +1,86 @@
+import os
+import random
+import pytest
+import flac_generator
+import frame_checker
+import frame_scanner
+from flac_verifier import verify_file
+from operations_with_bytes_and_bits import crc16
+
+ID3V1_TAG = b'TAG' + bytes(125)
+
+
+def write_flac(tmp_path, name='test.flac', trailer=b'', corrupt=None):
+    data = bytearray(flac_generator.make_flac(frames=8, encoding='fixed'))
+    if corrupt is not None:
+        data[corrupt] ^= 0x10
+
+    path = str(tmp_path / name)
+    with open(path, 'wb') as file:
+        file.write(data + trailer)
+
+    return path
+
+
+def get_offsets(tmp_path):
+    return list(frame_scanner.build_frame_index(write_flac(tmp_path, 'clean.flac')).offsets)
+
+
+@pytest.mark.parametrize('length', [0, 1, 2, 127, 128, 129, 255, 256, 257, 1000])
+def test_crc16_frames_single(length):
+    data = random.Random(length).randbytes(length + 7)
+    assert list(frame_checker.crc16_frames(data, [7], [length])) == [crc16(data[7:])]
+
+
+def test_crc16_frames_random_lengths():
+    generator = random.Random(0)
+    data = generator.randbytes(64 * 1024)
+    starts = [generator.randrange(len(data) // 2) for _ in range(200)]
+    lengths = [generator.randrange(len(data) - start) for start in starts]
+
+    expected = [crc16(data[start:start + length]) for start, length in zip(starts, lengths)]
+    assert list(frame_checker.crc16_frames(data, starts, lengths)) == expected
+
+
+def test_clean_file(tmp_path):
+    result = frame_checker.check_file(write_flac(tmp_path))
+    assert result['status'] == 'ok'
+    assert result['frames'] == 8
+
+
+def test_damaged_body(tmp_path):
+    offsets = get_offsets(tmp_path)
+    result = frame_checker.check_file(write_flac(tmp_path, corrupt=offsets[3] + 100))
+
+    assert result['status'] == 'damaged'
+    assert result['damaged frames'] == [offsets[3]]
+    assert result['damaged ranges'] == []
+
+
+def test_damaged_header(tmp_path):
+    offsets = get_offsets(tmp_path)
+    result = frame_checker.check_file(write_flac(tmp_path, corrupt=offsets[3] + 4))
+
+    assert result['status'] == 'damaged'
+    assert result['damaged frames'] == []
+    assert result['damaged ranges'] == [[offsets[3], offsets[4]]]
+
+
+@pytest.mark.parametrize('trailer', [ID3V1_TAG, b'APETAGEX' + bytes(4) + (32).to_bytes(4, 'little')
+                                     + bytes(16) + ID3V1_TAG])
+def test_tag_trailer(tmp_path, trailer):
+    path = write_flac(tmp_path, trailer=trailer)
+    result = frame_checker.check_file(path)
+
+    assert result['status'] == 'ok'
+    assert verify_file(path)['status'] == 'pass'
+    assert frame_scanner.build_frame_index(path).to_dict() == \
+        frame_scanner.build_frame_index(write_flac(tmp_path, 'clean.flac')).to_dict()
+
+
+def test_trailing_garbage(tmp_path):
+    size = os.path.getsize(write_flac(tmp_path, 'clean.flac'))
+
+    result = frame_checker.check_file(write_flac(tmp_path, trailer=b'\x13' * 100))
+    assert result['damaged frames'] == []
+    assert result['damaged ranges'] == [[size, size + 100]]
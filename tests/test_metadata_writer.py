@@ -0,0 +1,89 @@
+import random
+import flac_generator
+from flac_core import Parser
+from flac_verifier import verify_file
+from metadata_writer import PADDING, PICTURE, MetadataWriter, read_layout
+
+
+def write_flac(tmp_path, **shape):
+    path = str(tmp_path / 'test.flac')
+    flac_generator.write_flac(path, frames=6, noise=True, **shape)
+    return path
+
+
+def read_audio(path):
+    with open(path, 'rb') as file:
+        slots, audio_offset = read_layout(file)
+        file.seek(audio_offset)
+        return slots, file.read()
+
+
+def read_md5(path):
+    with open(path, 'rb') as file:
+        file.seek(8)
+        return file.read(34)[18:]
+
+
+def assert_audio_unchanged(path, audio, md5):
+    assert read_audio(path)[1] == audio
+    assert read_md5(path) == md5
+    assert verify_file(path)['status'] == 'pass'
+
+
+def test_tag_edit_in_place(tmp_path):
+    path = write_flac(tmp_path, tags_count=10, padding=8192)
+    slots, audio = read_audio(path)
+    md5 = read_md5(path)
+
+    writer = MetadataWriter(path)
+    writer.set_tag('TITLE', 'Edited title')
+    assert writer.save() == 'in place'
+
+    new_slots, _ = read_audio(path)
+    assert [slot.offset for slot in new_slots][:2] == [slot.offset for slot in slots][:2]
+    assert_audio_unchanged(path, audio, md5)
+
+    with Parser(path) as parser:
+        assert parser.parse_flac()
+        assert parser.vorbis_comment.get('TITLE') == ['Edited title']
+
+
+def test_picture_add_forces_rewrite(tmp_path):
+    path = write_flac(tmp_path, tags_count=10, padding=64)
+    _, audio = read_audio(path)
+    md5 = read_md5(path)
+
+    picture = flac_generator.make_png_stub(16 * 1024, random.Random(0))
+    writer = MetadataWriter(path)
+    writer.add_picture(picture, description='Front')
+    assert writer.save(padding=1024) == 'rewritten'
+
+    slots, _ = read_audio(path)
+    assert [slot.block_type for slot in slots].count(PICTURE) == 1
+    assert slots[-1].block_type == PADDING and slots[-1].length == 1024
+    assert_audio_unchanged(path, audio, md5)
+
+    with Parser(path, save_pic=False) as parser:
+        assert parser.parse_flac()
+        assert parser.pictures[0].length == len(picture)
+        assert parser.pictures[0].description == 'Front'
+
+
+def test_picture_removal_merges_padding(tmp_path):
+    path = write_flac(tmp_path, tags_count=10, picture_bytes=4096, padding=512)
+    slots, audio = read_audio(path)
+    md5 = read_md5(path)
+    picture_slot, padding_slot = slots[-2:]
+    assert (picture_slot.block_type, padding_slot.block_type) == (PICTURE, PADDING)
+
+    writer = MetadataWriter(path)
+    writer.remove_pictures()
+    assert writer.save() == 'in place'
+
+    new_slots, _ = read_audio(path)
+    assert len(new_slots) == len(slots) - 1
+    merged = new_slots[-1]
+    assert merged.block_type == PADDING and merged.was_last
+    assert merged.offset == picture_slot.offset
+    assert merged.size == picture_slot.size + padding_slot.size
+    assert_audio_unchanged(path, audio, md5)
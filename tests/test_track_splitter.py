@@ -0,0 +1,24 @@
+import numpy as np
+import flac_generator
+import frame_checker
+import track_splitter
+from flac_decoder import Decoder
+
+
+def decode(path):
+    return np.concatenate(list(Decoder(path)))
+
+
+def test_split_round_trip(tmp_path):
+    path = str(tmp_path / 'album.flac')
+    flac_generator.write_flac(path, frames=20, encoding='fixed', cue_tracks=3, cue_indexes=2)
+
+    results = list(track_splitter.split(path, str(tmp_path / 'tracks')))
+    assert [result['track'] for result in results] == [1, 2, 3]
+
+    for result in results:
+        assert frame_checker.check_file(result['path'])['status'] == 'ok'
+
+    tracks = [decode(result['path']) for result in results]
+    assert [len(samples) for samples in tracks] == [result['samples'] for result in results]
+    assert np.array_equal(np.concatenate(tracks), decode(path))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QImage
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache',
+                                 'flac_parser', 'thumbnails')
+
+
+def get_image_cost(image):
+    return image.bytesPerLine() * image.height()
+
+
+class ThumbnailCache:
+    def __init__(self, width, height, max_bytes=DEFAULT_MAX_BYTES, directory=None):
+        self.width = width
+        self.height = height
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.images = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def get_key(self, data):
+        digest = hashlib.sha1(data).hexdigest()
+        return '{}-{}x{}'.format(digest, self.width, self.height)
+
+    def get_path(self, key):
+        return os.path.join(self.directory, '{}.png'.format(key))
+
+    def get(self, key):
+        with self.lock:
+            image = self.images.get(key)
+            if image is not None:
+                self.images.move_to_end(key)
+                return image
+
+        if self.directory is None or not os.path.exists(self.get_path(key)):
+            return None
+
+        image = QImage(self.get_path(key))
+        if image.isNull():
+            return None
+
+        self.put(key, image)
+        return image
+
+    def put(self, key, image):
+        cost = get_image_cost(image)
+        if cost > self.max_bytes:
+            return
+
+        with self.lock:
+            if key in self.images:
+                self.size -= get_image_cost(self.images.pop(key))
+
+            self.images[key] = image
+            self.size += cost
+            while self.size > self.max_bytes:
+                _, evicted = self.images.popitem(last=False)
+                self.size -= get_image_cost(evicted)
+
+    def get_thumbnail(self, data):
+        key = self.get_key(data)
+        image = self.get(key)
+        if image is not None:
+            return image
+
+        image = QImage()
+        if not image.loadFromData(data):
+            return None
+
+        if image.width() > self.width or image.height() > self.height:
+            image = image.scaled(self.width, self.height, Qt.KeepAspectRatio,
+                                 Qt.SmoothTransformation)
+
+        self.put(key, image)
+        if self.directory is not None:
+            image.save(self.get_path(key), 'PNG')
+
+        return image
@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import bisect
+import os
+import tempfile
+import numpy as np
+import frame_scanner
+from flac_decoder import decode_frame
+from flac_core import BLOCK_TYPES, Parser
+from flac_records import StreamInfo
+from metadata_writer import DEFAULT_PADDING, Slot, make_vorbis_comment, read_layout, write_zeros
+from operations_with_bytes_and_bits import (crc8, crc16, crc16_shift, read_utf8_number,
+                                            write_utf8_number)
+
+CHUNK_SIZE = 1024 * 1024
+STREAMINFO = BLOCK_TYPES['STREAMINFO']
+PADDING = BLOCK_TYPES['PADDING']
+VORBIS_COMMENT = BLOCK_TYPES['VORBIS_COMMENT']
+PICTURE = BLOCK_TYPES['PICTURE']
+STREAMINFO_LENGTH = 34
+MIN_BLOCK_SIZE = 16
+MAX_BLOCK_SIZE = 65535
+VARIABLE_BLOCK_SIZE_CODE = 7
+SUBFRAME_VERBATIM = 0x02
+LEAD_OUT_NUMBERS = (170, 255)
+TRACK_TAGS = {'TITLE', 'TRACKNUMBER', 'TRACKTOTAL', 'TOTALTRACKS', 'ISRC', 'CUESHEET'}
+
+COPY, ENCODE = range(2)
+
+
+def get_track_start(track):
+    for index_point in track.index_points:
+        if index_point.number == 1:
+            return track.offset + index_point.offset
+
+    return track.offset
+
+
+def get_track_ranges(cuesheet, total_samples):
+    tracks = [track for track in cuesheet.tracks if track.number not in LEAD_OUT_NUMBERS]
+    lead_out = [track.offset for track in cuesheet.tracks if track.number in LEAD_OUT_NUMBERS]
+    end = min(lead_out[0] if lead_out else total_samples, total_samples)
+
+    ranges = []
+    for position, track in enumerate(tracks):
+        start = track.offset if position == 0 else get_track_start(track)
+        stop = get_track_start(tracks[position + 1]) if position + 1 < len(tracks) else end
+        stop = min(stop, end)
+        if not track.is_data and stop > start:
+            ranges.append((track, start, stop))
+
+    return ranges
+
+
+def make_track_tags(tags, track, tracks_count):
+    result = [(key, value) for key, value in tags if key.upper() not in TRACK_TAGS]
+    result.append(('TRACKNUMBER', str(track.number)))
+    result.append(('TRACKTOTAL', str(tracks_count)))
+    if track.isrc:
+        result.append(('ISRC', track.isrc))
+
+    return result
+
+
+def plan_track(index, start, end):
+    first = max(bisect.bisect_right(index.samples, start) - 1, 0)
+    last = bisect.bisect_left(index.samples, end)
+
+    parts = []
+    for number in range(first, last):
+        block_size = index.block_sizes[number]
+        low = max(start - index.samples[number], 0)
+        high = min(end - index.samples[number], block_size)
+        if low == 0 and high == block_size and number < len(index) - 1:
+            parts.append((COPY, number, low, high))
+        else:
+            parts.append((ENCODE, number, low, high))
+
+    if len(parts) > 1 and parts[0][0] == ENCODE:
+        head = parts[0][3] - parts[0][2]
+        if head < MIN_BLOCK_SIZE and head + parts[1][3] - parts[1][2] <= MAX_BLOCK_SIZE:
+            parts[1] = (ENCODE,) + parts[1][1:]
+
+    return parts
+
+
+def rewrite_frame_header(data, position, sample_number, stream):
+    header = frame_scanner.parse_frame_header(data, position, stream)
+    if header is None:
+        raise ValueError('Damaged frame header at offset {}'.format(position))
+
+    number_length = read_utf8_number(data, position + 4)[1]
+    result = bytearray(data[position:position + 4])
+    result[1] |= 1
+    result += write_utf8_number(sample_number)
+    result += data[position + 4 + number_length:position + header.header_length - 1]
+    result.append(crc8(result))
+    return header.header_length, bytes(result)
+
+
+def encode_verbatim_frame(samples, sample_number, bits_per_sample):
+    count, channels = samples.shape
+    header = bytearray(b'\xff\xf9')
+    header.append(VARIABLE_BLOCK_SIZE_CODE << 4)
+    header.append((channels - 1) << 4)
+    header += write_utf8_number(sample_number)
+    header += (count - 1).to_bytes(2, byteorder='big')
+    header.append(crc8(header))
+
+    shifts = np.arange(bits_per_sample - 1, -1, -1, dtype=np.int64)
+    bits = (samples.T.astype(np.int64)[:, :, None] >> shifts) & 1
+    subframe_header = np.unpackbits(np.array([SUBFRAME_VERBATIM], dtype=np.uint8))
+    rows = np.concatenate((np.broadcast_to(subframe_header, (channels, 8)),
+                           bits.reshape(channels, -1)), axis=1)
+
+    frame = bytes(header) + np.packbits(rows.ravel().astype(np.uint8)).tobytes()
+    return frame + crc16(frame).to_bytes(2, byteorder='big')
+
+
+class TrackSplitter:
+    def __init__(self, path):
+        self.path = path
+        with Parser(path, block_types=['VORBIS_COMMENT', 'CUESHEET']) as parser:
+            if not parser.parse_flac():
+                raise ValueError('Given file is not FLAC')
+
+            self.cuesheet = parser.cuesheet
+            self.tags = parser.vorbis_comment.tags if parser.vorbis_comment else []
+
+        if self.cuesheet is None:
+            raise ValueError('Given file has no CUESHEET block')
+
+        self.index = frame_scanner.build_frame_index(path)
+        self.stream = self.index.stream
+        self.file = open(path, 'rb')
+        self.pictures = self.read_pictures()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.file.close()
+
+    def read_pictures(self):
+        slots, _ = read_layout(self.file)
+        pictures = []
+        for slot in slots:
+            if slot.block_type == PICTURE:
+                self.file.seek(slot.offset + 4)
+                pictures.append(self.file.read(slot.length))
+
+        return pictures
+
+    def read_frame(self, number):
+        self.file.seek(self.index.offsets[number])
+        return self.file.read(self.index.frame_sizes[number])
+
+    def decode(self, number, low, high):
+        data = self.read_frame(number)
+        header = frame_scanner.parse_frame_header(data, 0, self.stream)
+        if header is None:
+            raise ValueError('Damaged frame header at offset {}'
+                             .format(self.index.offsets[number]))
+
+        return decode_frame(header, data)[low:high]
+
+    def copy_frames(self, first, last, start, target):
+        index = self.index
+        sizes = []
+        number = first
+
+        while number < last:
+            run_offset = index.offsets[number]
+            run_end = number + 1
+            while run_end < last and \
+                    index.offsets[run_end] + index.frame_sizes[run_end] - run_offset <= CHUNK_SIZE:
+                run_end += 1
+
+            self.file.seek(run_offset)
+            data = self.file.read(index.offsets[run_end - 1] + index.frame_sizes[run_end - 1] -
+                                  run_offset)
+            view = memoryview(data)
+
+            for frame in range(number, run_end):
+                position = index.offsets[frame] - run_offset
+                end = position + index.frame_sizes[frame]
+                header_length, header = rewrite_frame_header(
+                    data, position, index.samples[frame] - start, self.stream)
+
+                old_crc = crc16(view[position:position + header_length]) ^ crc16(header)
+                stored = int.from_bytes(view[end - 2:end], byteorder='big')
+                body_length = end - 2 - position - header_length
+                crc = stored ^ crc16_shift(old_crc, body_length)
+
+                target.write(header)
+                target.write(view[position + header_length:end - 2])
+                target.write(crc.to_bytes(2, byteorder='big'))
+                sizes.append((index.block_sizes[frame], len(header) + body_length + 2))
+
+            number = run_end
+
+        return sizes
+
+    def write_frames(self, parts, start, target):
+        sizes = []
+        samples = None
+        position = 0
+
+        while position < len(parts):
+            kind, number, low, high = parts[position]
+            if kind == COPY:
+                last = position
+                while last < len(parts) and parts[last][0] == COPY:
+                    last += 1
+
+                sizes += self.copy_frames(number, parts[last - 1][1] + 1, start, target)
+                position = last
+                continue
+
+            decoded = self.decode(number, low, high)
+            samples = decoded if samples is None else np.concatenate((samples, decoded))
+            position += 1
+            if len(samples) < MIN_BLOCK_SIZE and position < len(parts) and \
+                    parts[position][0] == ENCODE:
+                continue
+
+            sample_number = self.index.samples[number] + high - len(samples) - start
+            frame = encode_verbatim_frame(samples, sample_number, self.stream.bits_per_sample)
+            target.write(frame)
+            sizes.append((len(samples), len(frame)))
+            samples = None
+
+        return sizes
+
+    def write_track(self, track, start, end, path, tracks_count, padding=DEFAULT_PADDING):
+        blocks = [(VORBIS_COMMENT, make_vorbis_comment(
+            'flac_parser', make_track_tags(self.tags, track, tracks_count)))]
+        blocks += [(PICTURE, body) for body in self.pictures]
+
+        directory = os.path.dirname(os.path.abspath(path))
+        descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+
+        try:
+            with os.fdopen(descriptor, 'wb', buffering=CHUNK_SIZE) as target:
+                target.write(b'fLaC')
+                target.write(Slot(0, STREAMINFO, STREAMINFO_LENGTH).get_header())
+                target.write(bytes(STREAMINFO_LENGTH))
+                for block_type, body in blocks:
+                    target.write(Slot(0, block_type, len(body)).get_header())
+                    target.write(body)
+
+                padding_slot = Slot(0, PADDING, padding)
+                padding_slot.is_last = True
+                target.write(padding_slot.get_header())
+                write_zeros(target, padding)
+
+                sizes = self.write_frames(plan_track(self.index, start, end), start, target)
+                block_sizes = [block_size for block_size, _ in sizes]
+                frame_sizes = [frame_size for _, frame_size in sizes]
+                streaminfo = StreamInfo(min(block_sizes[:-1] or block_sizes), max(block_sizes),
+                                        min(frame_sizes), max(frame_sizes),
+                                        self.stream.sample_rate, self.stream.channels,
+                                        self.stream.bits_per_sample, end - start, 0)
+
+                target.seek(8)
+                target.write(streaminfo.to_bytes())
+
+            os.replace(temp_path, path)
+
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return {'path': path,
+                'track': track.number,
+                'start': start,
+                'samples': end - start,
+                'frames': len(sizes)}
+
+    def split(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        ranges = get_track_ranges(self.cuesheet, self.index.get_total_samples())
+        for track, start, end in ranges:
+            path = os.path.join(directory, '{:02d}.flac'.format(track.number))
+            yield self.write_track(track, start, end, path, len(ranges))
+
+
+def split(path, directory=None):
+    if directory is None:
+        directory = os.path.splitext(path)[0]
+
+    with TrackSplitter(path) as splitter:
+        yield from splitter.split(directory)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+import struct
+import tempfile
+import numpy as np
+import frame_scanner
+import operations_with_processes as owp
+from flac_decoder import decode_frame
+
+BUCKETS = 1024
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache',
+                                 'flac_parser', 'peaks')
+HEADER = struct.Struct('<4sHI')
+MAGIC = b'FLPK'
+VERSION = 1
+
+
+class Peaks:
+    __slots__ = ('mins', 'maxs', 'rms')
+
+    def __init__(self, mins, maxs, rms):
+        self.mins = mins
+        self.maxs = maxs
+        self.rms = rms
+
+    def __len__(self):
+        return len(self.mins)
+
+
+def get_key(path, md5=None, buckets=BUCKETS):
+    if md5:
+        digest = md5.to_bytes(16, byteorder='big').hex()
+    else:
+        stat = os.stat(path)
+        digest = hashlib.sha1('{}\0{}\0{}'.format(os.path.abspath(path), stat.st_size,
+                                                 stat.st_mtime_ns).encode('utf-8')).hexdigest()
+
+    return '{}-{}'.format(digest, buckets)
+
+
+def get_sidecar_path(key, directory=DEFAULT_DIRECTORY):
+    return os.path.join(directory, '{}.peaks'.format(key))
+
+
+def load_peaks(path):
+    try:
+        with open(path, 'rb') as file:
+            magic, version, buckets = HEADER.unpack(file.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                return None
+
+            data = np.fromfile(file, dtype='<i2', count=buckets * 3)
+    except (OSError, struct.error):
+        return None
+
+    if len(data) != buckets * 3:
+        return None
+
+    return Peaks(data[:buckets], data[buckets:2 * buckets], data[2 * buckets:].view('<u2'))
+
+
+def save_peaks(peaks, path):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, VERSION, len(peaks)))
+            file.write(peaks.mins.astype('<i2').tobytes())
+            file.write(peaks.maxs.astype('<i2').tobytes())
+            file.write(peaks.rms.astype('<u2').tobytes())
+
+        os.replace(temp_path, path)
+
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def iter_chunk_frames(path, stream, start_offset, end_offset):
+    with open(path, 'rb') as file:
+        for header, data in frame_scanner.FrameScanner(file, start_offset, stream, with_data=True):
+            if header.offset >= end_offset:
+                break
+
+            yield header, decode_frame(header, data)
+
+
+def reduce_chunk(task):
+    path, stream, start_offset, end_offset, total_samples, buckets = task
+    mins = np.full(buckets, np.iinfo(np.int64).max, dtype=np.int64)
+    maxs = np.full(buckets, np.iinfo(np.int64).min, dtype=np.int64)
+    squares = np.zeros(buckets, dtype=np.float64)
+    counts = np.zeros(buckets, dtype=np.int64)
+
+    for header, samples in iter_chunk_frames(path, stream, start_offset, end_offset):
+        positions = np.arange(header.sample_number, header.sample_number + len(samples),
+                              dtype=np.int64)
+        indexes = np.minimum(positions * buckets // total_samples, buckets - 1)
+        starts = np.flatnonzero(np.diff(indexes, prepend=-1))
+        bucket_ids = indexes[starts]
+
+        np.minimum.at(mins, bucket_ids, np.minimum.reduceat(samples.min(axis=1), starts))
+        np.maximum.at(maxs, bucket_ids, np.maximum.reduceat(samples.max(axis=1), starts))
+        power = np.square(samples, dtype=np.float64).sum(axis=1)
+        np.add.at(squares, bucket_ids, np.add.reduceat(power, starts))
+        np.add.at(counts, bucket_ids, np.diff(np.append(starts, len(samples))) * samples.shape[1])
+
+    return mins, maxs, squares, counts
+
+
+def split_frames(index, parts):
+    count = len(index)
+    bounds = sorted({count * part // parts for part in range(parts + 1)})
+    for start, end in zip(bounds, bounds[1:]):
+        end_offset = index.offsets[end] if end < count else float('inf')
+        yield index.offsets[start], end_offset
+
+
+def compute_peaks(path, buckets=BUCKETS, workers=None, context=None):
+    index = frame_scanner.build_frame_index(path)
+    total_samples = index.get_total_samples()
+    if not total_samples:
+        raise ValueError('Given file has no audio frames')
+
+    workers = owp.get_workers_count(workers)
+    tasks = [(path, index.stream, start, end, total_samples, buckets)
+             for start, end in split_frames(index, workers * 2)]
+
+    mins = np.full(buckets, np.iinfo(np.int64).max, dtype=np.int64)
+    maxs = np.full(buckets, np.iinfo(np.int64).min, dtype=np.int64)
+    squares = np.zeros(buckets, dtype=np.float64)
+    counts = np.zeros(buckets, dtype=np.int64)
+
+    for chunk_mins, chunk_maxs, chunk_squares, chunk_counts in \
+            owp.map_unordered(reduce_chunk, tasks, workers, context=context):
+        np.minimum(mins, chunk_mins, out=mins)
+        np.maximum(maxs, chunk_maxs, out=maxs)
+        squares += chunk_squares
+        counts += chunk_counts
+
+    empty = counts == 0
+    mins[empty] = 0
+    maxs[empty] = 0
+    scale = float(1 << (index.stream.bits_per_sample - 1))
+    rms = np.sqrt(squares / np.maximum(counts, 1)) / scale
+
+    return Peaks(np.clip(np.round(mins / scale * 32767), -32768, 32767).astype(np.int16),
+                 np.clip(np.round(maxs / scale * 32767), -32768, 32767).astype(np.int16),
+                 np.clip(np.round(rms * 65535), 0, 65535).astype(np.uint16))
+
+
+def get_peaks(path, md5=None, buckets=BUCKETS, workers=None, directory=DEFAULT_DIRECTORY,
+              context=None):
+    if md5 is None:
+        md5 = frame_scanner.read_stream(path)[0].md5
+
+    sidecar_path = get_sidecar_path(get_key(path, md5, buckets), directory)
+    peaks = load_peaks(sidecar_path)
+    if peaks is not None:
+        return peaks
+
+    peaks = compute_peaks(path, buckets, workers, context)
+    save_peaks(peaks, sidecar_path)
+    return peaks
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from PyQt5.QtCore import QLineF, QRectF, Qt
+from PyQt5.QtGui import QColor, QPainter, QPixmap
+from PyQt5.QtWidgets import QSlider, QStyle
+
+PEAK_COLOR = QColor(120, 120, 120)
+RMS_COLOR = QColor(70, 70, 70)
+PLAYED_COLOR = QColor(40, 120, 220, 90)
+HEAD_COLOR = QColor(40, 120, 220)
+
+
+class WaveformSlider(QSlider):
+    def __init__(self, parent=None):
+        super(WaveformSlider, self).__init__(Qt.Horizontal, parent)
+        self.peaks = None
+        self.overview = None
+        self.setMinimumHeight(48)
+
+    def set_peaks(self, peaks):
+        self.peaks = peaks
+        self.overview = None
+        self.update()
+
+    def resizeEvent(self, event):
+        self.overview = None
+        super(WaveformSlider, self).resizeEvent(event)
+
+    def make_overview(self):
+        width = max(self.width(), 1)
+        height = max(self.height(), 1)
+        pixmap = QPixmap(width, height)
+        pixmap.fill(Qt.transparent)
+
+        painter = QPainter(pixmap)
+        middle = height / 2
+        scale = middle / 32768
+        count = len(self.peaks)
+
+        for x in range(width):
+            start = x * count // width
+            end = max((x + 1) * count // width, start + 1)
+            low = int(self.peaks.mins[start:end].min())
+            high = int(self.peaks.maxs[start:end].max())
+            rms = int(self.peaks.rms[start:end].max()) / 2
+
+            painter.setPen(PEAK_COLOR)
+            painter.drawLine(QLineF(x, middle - high * scale, x, middle - low * scale))
+            painter.setPen(RMS_COLOR)
+            painter.drawLine(QLineF(x, middle - rms * scale, x, middle + rms * scale))
+
+        painter.end()
+        return pixmap
+
+    def get_head_position(self):
+        if self.maximum() <= self.minimum():
+            return 0
+
+        return QStyle.sliderPositionFromValue(self.minimum(), self.maximum(),
+                                              self.value(), self.width())
+
+    def paintEvent(self, event):
+        if self.peaks is None:
+            super(WaveformSlider, self).paintEvent(event)
+            return
+
+        if self.overview is None or self.overview.size() != self.size():
+            self.overview = self.make_overview()
+
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self.overview)
+        head = self.get_head_position()
+        painter.fillRect(QRectF(0, 0, head, self.height()), PLAYED_COLOR)
+        painter.setPen(HEAD_COLOR)
+        painter.drawLine(head, 0, head, self.height())
+        painter.end()
+
+    def mousePressEvent(self, event):
+        if self.peaks is None or event.button() != Qt.LeftButton:
+            super(WaveformSlider, self).mousePressEvent(event)
+            return
+
+        self.seek_to(event.x())
+        self.setSliderDown(True)
+
+    def mouseMoveEvent(self, event):
+        if self.peaks is None or not self.isSliderDown():
+            super(WaveformSlider, self).mouseMoveEvent(event)
+            return
+
+        self.seek_to(event.x())
+
+    def mouseReleaseEvent(self, event):
+        if self.peaks is None:
+            super(WaveformSlider, self).mouseReleaseEvent(event)
+            return
+
+        self.setSliderDown(False)
+
+    def seek_to(self, x):
+        value = QStyle.sliderValueFromPosition(self.minimum(), self.maximum(),
+                                               min(max(x, 0), self.width()), self.width())
+        self.setValue(value)
+        self.sliderMoved.emit(value)